@@ -1,6 +1,7 @@
 from .auth_service import AuthService
 from .answer_generator import AnswerGenerator
+from .async_answer_generator import AsyncAnswerGenerator
 from .chat_session_initializer import ChatSessionInitializer
 from .answer_factory import AnswerFactory
 
-__all__ = ['AuthService', 'AnswerGenerator', 'ChatSessionInitializer', 'AnswerFactory']
+__all__ = ['AuthService', 'AnswerGenerator', 'AsyncAnswerGenerator', 'ChatSessionInitializer', 'AnswerFactory']
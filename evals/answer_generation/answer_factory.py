@@ -1,10 +1,28 @@
-from abc import abstractmethod
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import json
 import os
 from answer_generation.answer_generator import AnswerGenerator
 
+# Answer generator of a worker process, set once by _init_worker
+_worker_answer_generator = None
+
+def _init_worker(answer_generator: AnswerGenerator):
+    global _worker_answer_generator
+    _worker_answer_generator = answer_generator
+
+def _create_answer(question: str) -> str:
+    return _worker_answer_generator.create_answer(question)
+
 class AnswerFactory:
+
+    # Upper bound on questions in flight against the chatbot backend
+    MAX_CONCURRENCY = 32
+
+    # Number of records buffered in memory before they are written to the output file
+    FLUSH_EVERY = 100
+
     def __init__(
             self, 
             answer_generator: AnswerGenerator, 
@@ -15,20 +33,107 @@ class AnswerFactory:
         self.input_file_path = input_file_path
         self.output_folder_path = output_folder_path
         self.output_file_path = self._create_output_file()
+        # Keep the output file open for the whole run instead of reopening it per record
+        self._output_file = open(self.output_file_path, 'ab', buffering=1 << 20)
+        self._pending_records = bytearray()
+        self._records_since_flush = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Flush and close the output file."""
+        if not self._output_file.closed:
+            self._flush_output_file()
+            self._output_file.close()
+
+    def run(self, max_workers: int = 8) -> str:
+        """
+        Generate a chatbot answer for every question.
 
-    @abstractmethod
-    def run(self) -> str:
-        pass
+        Questions are spread over `max_workers` processes, each with its own copy of the
+        answer generator and its own HTTP connection pool. For sync-only chatbot clients
+        this gives real parallelism where threads would be serialized by the GIL.
+        The results come back in input order and only this process writes the output file.
+        Use max_workers=1 to answer the questions one at a time in this process.
+        """
+        qa_pairs = self._load_input_data()
+        questions = [qa['question'] for qa in qa_pairs]
+
+        try:
+            if max_workers <= 1:
+                self._write_answers(qa_pairs, map(self.answer_generator.create_answer, questions))
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.answer_generator,)
+                ) as executor:
+                    self._write_answers(qa_pairs, executor.map(_create_answer, questions))
+        finally:
+            self.close()
+
+        return self.output_file_path
+
+    async def arun(self) -> str:
+        """
+        Generate chatbot answers for all questions concurrently.
+
+        Requires an answer generator exposing `acreate_answer` (see AsyncAnswerGenerator).
+        Answers are written as they complete, so the output is in completion order.
+        """
+        qa_pairs = self._load_input_data()
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+
+        async def answer(qa):
+            async with semaphore:
+                return qa, await self.answer_generator.acreate_answer(qa['question'])
+
+        tasks = [asyncio.ensure_future(answer(qa)) for qa in qa_pairs]
+        try:
+            for task in asyncio.as_completed(tasks):
+                qa, chatbot_answer = await task
+                qa['chatbot_answer'] = chatbot_answer
+                self._append_to_output_file(qa)
+        finally:
+            # Only left running when a question failed
+            for task in tasks:
+                task.cancel()
+            self.close()
+
+        return self.output_file_path
+
+    def _write_answers(self, qa_pairs, chatbot_answers):
+        # Answers arrive in input order, so the output keeps the order of the questions
+        for qa, chatbot_answer in zip(qa_pairs, chatbot_answers):
+            qa['chatbot_answer'] = chatbot_answer
+            self._append_to_output_file(qa)
 
-    @abstractmethod
     def _load_input_data(self):
-        pass
-    
+        # The input is the JSON Lines file of Q&A pairs written by the synthetic data generation,
+        # files of earlier runs hold a single JSON array
+        with open(self.input_file_path, 'r', encoding='utf-8') as file:
+            if self.input_file_path.endswith('.jsonl'):
+                return [json.loads(line) for line in file if line.strip()]
+            return json.load(file)
+
     def _append_to_output_file(self, content: json):
-        # Append to the JSONL file
-        with open(self.output_file_path, 'a', encoding='utf-8') as file:
-            json.dump(content, file)
-            file.write('\n')
+        # Buffer the JSONL line, the file is written once every FLUSH_EVERY records
+        self._pending_records += json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        self._records_since_flush += 1
+        if self._records_since_flush >= self.FLUSH_EVERY:
+            self._flush_output_file()
+
+    def _flush_output_file(self):
+        # Write all buffered records with a single write call
+        if self._pending_records:
+            self._output_file.write(self._pending_records)
+            self._output_file.flush()
+            self._pending_records.clear()
+        self._records_since_flush = 0
 
     # Use jsonl file since it is more efficient for appending data
     def _create_output_file(self):
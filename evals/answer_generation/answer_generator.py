@@ -1,10 +1,30 @@
 import json
 from datetime import datetime
-import requests
+from types import MappingProxyType
+import httpx
 from .auth_service import AuthService
 from .chat_session_initializer import ChatSessionInitializer
 
 class AnswerGenerator:
+
+    # Static parts of the chat message payload, built once instead of per question
+    _HISTORY_TEMPLATE = {
+        "Id": "",
+        "UserId": "e110e23e-d5a4-45dc-b29b-3224d98aa664.33dab507-5210-4075-805b-f2717d8cfa74",
+        "UserName": "Tester Testsson",
+        "ChatId": None,
+        "Content": None,
+        "Type": 0,
+        "AuthorRole": 0,
+        "UserFeedback": 0,
+        "Timestamp": None
+    }
+    _MESSAGE_TYPE_VARIABLE = {"key": "messageType", "value": "0"}
+    _STATIC_VARIABLES = (
+        {"key": "citationIds", "value": None},
+        {"key": "optimizeToken", "value": "true"}
+    )
+
     def __init__(
             self,
             base_url: str,
@@ -19,26 +39,60 @@ class AnswerGenerator:
             expert_identifier=expert_identifier,
             auth_service=auth_service
         )
+        self._client = self._create_client()
+        # Snapshot of the auth headers, refreshed when the backend answers 401
+        self._headers = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        "Close the pooled HTTP client."
+        self._client.close()
+
+    def __getstate__(self):
+        # The HTTP client and the read-only headers snapshot can't be pickled, worker processes
+        # build their own client and fetch their own headers on the first request
+        state = self.__dict__.copy()
+        del state['_client']
+        state['_headers'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._client = self._create_client()
 
     def create_answer(self, question):
         
         # Create a new chat session
         chat_id = self._create_new_chat_session()
         
-        # Build the payload and headers
-        headers = self._get_headers()
+        # Build the payload
         payload = self._get_payload(question, chat_id)
 
         # Build full URL
         full_url = self._build_full_url(chat_id)
 
-        response = requests.post(
+        response = self._client.post(
             full_url,
-            headers=headers,
-            json=payload,
-            verify=False
+            headers=self._get_headers(),
+            json=payload
         )
+        if response.status_code == 401:
+            # The token has expired, refresh the headers and retry once
+            response = self._client.post(
+                full_url,
+                headers=self._get_headers(refresh=True),
+                json=payload
+            )
+
+        return self._extract_answer(response)
 
+    def _extract_answer(self, response):
+        "Return the chatbot answer from an API response, or an error message."
         # Check if request was successful
         if response.status_code == 200:
             response_data = response.json()
@@ -57,32 +111,27 @@ class AnswerGenerator:
             print("Response:", response.text)
             return f"Error: API request failed with status code {response.status_code}"
 
-
-    def _get_headers(self):
-        return self.auth_service.get_auth_headers()
+    def _get_headers(self, refresh: bool = False):
+        # Fetched once and reused for every question, read-only so concurrent tasks can share it
+        if refresh or self._headers is None:
+            self._headers = MappingProxyType(dict(self.auth_service.get_auth_headers()))
+        return self._headers
     
     def _get_payload(self, question, chat_id):
         
-        history = {
-            "Id": "",
-            "UserId": "e110e23e-d5a4-45dc-b29b-3224d98aa664.33dab507-5210-4075-805b-f2717d8cfa74",
-            "UserName": "Tester Testsson",
-            "ChatId": chat_id,
-            "Content": question,
-            "Type": 0,
-            "AuthorRole": 0,
-            "UserFeedback": 0,
-            "Timestamp": datetime.now().isoformat()
-        } 
+        # Only the per-question fields are filled in, the rest comes from the templates
+        history = self._HISTORY_TEMPLATE.copy()
+        history["ChatId"] = chat_id
+        history["Content"] = question
+        history["Timestamp"] = datetime.now().isoformat()
         
         return {
             "input": question,
             "variables": [
                 {"key": "chatId", "value": chat_id},
-                {"key": "messageType", "value": "0"},
-                {"key": "history", "value": json.dumps([history])},
-                {"key": "citationIds", "value": None},
-                {"key": "optimizeToken", "value": "true"}
+                self._MESSAGE_TYPE_VARIABLE,
+                {"key": "history", "value": json.dumps([history], separators=(',', ':'))},
+                *self._STATIC_VARIABLES
             ]
         }
     
@@ -92,4 +141,14 @@ class AnswerGenerator:
 
     def _create_new_chat_session(self):
         "Return the session ID of the newly created chat session."
-        return self.chat_session_initializer.initialize_chat_session()
\ No newline at end of file
+        return self.chat_session_initializer.initialize_chat_session()
+
+    def _create_client(self):
+        "Return a client that keeps connections to the chatbot backend alive between questions."
+        # Retries failed connection attempts, HTTP/2 multiplexes requests over one connection
+        transport = httpx.HTTPTransport(retries=3, verify=False, http2=True)
+        return httpx.Client(
+            base_url=self.base_url,
+            transport=transport,
+            timeout=httpx.Timeout(120.0, connect=5.0)
+        )
@@ -0,0 +1,53 @@
+import asyncio
+import httpx
+from .auth_service import AuthService
+from .answer_generator import AnswerGenerator
+
+class AsyncAnswerGenerator(AnswerGenerator):
+    def __init__(
+            self,
+            base_url: str,
+            auth_service: AuthService,
+            expert_identifier: str,
+            http_client: httpx.AsyncClient
+        ):
+        super().__init__(
+            base_url=base_url,
+            auth_service=auth_service,
+            expert_identifier=expert_identifier
+        )
+        # Shared client so concurrent questions reuse the same connection pool, owned by the caller
+        self.http_client = http_client
+
+    def _create_client(self):
+        # Requests go through the shared async client, no sync client is built
+        return None
+
+    def close(self):
+        "Nothing to close, the shared async client is closed by its owner."
+
+    async def acreate_answer(self, question):
+
+        # The chat session initializer is blocking, keep it off the event loop
+        chat_id = await asyncio.to_thread(self._create_new_chat_session)
+
+        # Build the payload
+        payload = self._get_payload(question, chat_id)
+
+        # Build full URL
+        full_url = self._build_full_url(chat_id)
+
+        response = await self.http_client.post(
+            full_url,
+            headers=self._get_headers(),
+            json=payload
+        )
+        if response.status_code == 401:
+            # The token has expired, refresh the headers and retry once
+            response = await self.http_client.post(
+                full_url,
+                headers=self._get_headers(refresh=True),
+                json=payload
+            )
+
+        return self._extract_answer(response)
@@ -0,0 +1,136 @@
+import functools
+from typing import ClassVar
+import httpx
+from openai import AzureOpenAI, AsyncAzureOpenAI
+from pydantic import BaseModel
+
+class BaseEvaluator:
+    """
+    LLM judge shared by the custom evaluators.
+
+    Subclasses only set the prompts and the response model. The judge is called in JSON mode with
+    temperature 0.0, and with an EvaluatorCache the result of a prompt evaluated before is reused.
+
+    Usage:
+        evaluator(question=..., chatbot_answer=...)
+        await evaluator.__acall__(question=..., chatbot_answer=...)
+        await evaluator.aclose()
+    """
+
+    MODEL = "gpt-4.1"
+
+    # Set by subclasses, the name the results are cached under, the system prompt, the user
+    # prompt with a {placeholder} per input column and the model the JSON reply is validated with
+    NAME: ClassVar[str]
+    SYSTEM_PROMPT: ClassVar[str]
+    USER_PROMPT_TEMPLATE: ClassVar[str]
+    RESPONSE_MODEL: ClassVar[type[BaseModel]]
+
+    def __init__(
+            self,
+            model_config_dict: dict,
+            async_http_client: httpx.AsyncClient = None,
+            cache=None
+        ):
+        """
+        Args:
+            model_config_dict: The api_version, azure_endpoint and api_key of the Azure OpenAI resource.
+            async_http_client: Optional HTTP client shared with other evaluators, closed by its owner.
+            cache: Optional EvaluatorCache, skips the LLM call for prompts evaluated before.
+        """
+        self.model_config = model_config_dict
+        self.cache = cache
+
+        # Built once so its connection pool is reused across rows
+        self._owns_async_http_client = async_http_client is None
+        self._async_client = AsyncAzureOpenAI(
+            api_version=self.model_config["api_version"],
+            azure_endpoint=self.model_config["azure_endpoint"],
+            api_key=self.model_config["api_key"],
+            http_client=async_http_client or httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+            )
+        )
+
+    @functools.cached_property
+    def _client(self) -> AzureOpenAI:
+        # Only built on the first sync call, the evaluation runner and alignment scripts use the async client
+        return AzureOpenAI(
+            api_version=self.model_config["api_version"],
+            azure_endpoint=self.model_config["azure_endpoint"],
+            api_key=self.model_config["api_key"]
+        )
+
+    def __call__(self, **inputs) -> dict:
+        user_prompt, result = self._prepare(inputs)
+        if result is None:
+            completion = self._client.chat.completions.create(**self._get_request(user_prompt))
+            result = self._parse_completion(user_prompt, completion)
+
+        return result
+
+    async def __acall__(self, **inputs) -> dict:
+        """Async variant of __call__, used to run several evaluators on a row concurrently."""
+        user_prompt, result = self._prepare(inputs)
+        if result is None:
+            completion = await self._async_client.chat.completions.create(**self._get_request(user_prompt))
+            result = self._parse_completion(user_prompt, completion)
+
+        return result
+
+    async def aclose(self):
+        """Close the clients of the evaluator, a shared async HTTP client is closed by its owner."""
+        if "_client" in self.__dict__:
+            self._client.close()
+        if self._owns_async_http_client:
+            await self._async_client.close()
+
+    def _prepare(self, inputs: dict) -> tuple:
+        """
+        Build the user prompt and look up a result that needs no LLM call.
+
+        Returns:
+            The user prompt and the result, or None if the LLM has to be called.
+        """
+        user_prompt = self.USER_PROMPT_TEMPLATE.format(**inputs)
+        result = self._get_fast_path_result(**inputs)
+        if result is None:
+            result = self._get_cached_result(user_prompt)
+        return user_prompt, result
+
+    def _get_fast_path_result(self, **inputs) -> dict | None:
+        # Overridden by evaluators that can decide some rows without the LLM
+        return None
+
+    def _get_request(self, user_prompt: str) -> dict:
+        # Arguments of the chat completion call, the same for the sync and async client
+        return dict(
+            model=self.MODEL,
+            messages=[
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={"type": "json_object"},
+            max_completion_tokens=200,
+            temperature=0.0,
+            #top_p=1.0,
+            frequency_penalty=0.0,
+            presence_penalty=0.0,
+        )
+
+    def _parse_completion(self, user_prompt: str, completion) -> dict:
+        # JSON mode does not enforce the keys, a reply that does not match RESPONSE_MODEL raises a
+        # ValidationError and is not cached
+        result = self.RESPONSE_MODEL.model_validate_json(completion.choices[0].message.content).model_dump()
+        self._set_cached_result(user_prompt, result)
+        return result
+
+    def _get_cached_result(self, user_prompt: str):
+        if self.cache is None:
+            return None
+        return self.cache.get(self.NAME, self.MODEL, self.SYSTEM_PROMPT, user_prompt)
+
+    def _set_cached_result(self, user_prompt: str, result: dict):
+        if self.cache is not None:
+            self.cache.set(self.NAME, self.MODEL, self.SYSTEM_PROMPT, user_prompt, result)
@@ -1,47 +1,43 @@
+import asyncio
 import json
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 load_dotenv()
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import seaborn as sns
-from azure.ai.evaluation import evaluate
 from sklearn.metrics import cohen_kappa_score
-from sklearn.metrics import confusion_matrix
-from citation_evaluator import CitationEvaluator
+# Run as a script, the evals folder is put on the path so the evaluation package can be imported
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from evaluation.citation_evaluator.citation_evaluator import CitationEvaluator
 
+# Rows sent to the model at the same time, large enough to overlap the request
+# latency and small enough to stay clear of tokens-per-minute spikes
+BATCH_SIZE = 16
+# Rows read from the alignment data at a time
+CHUNK_SIZE = 256
 
 
-def evaluate_alignment(alignment_data_path):
+def evaluate_alignment(alignment_data_path, plot: bool = True):
     """
     Evaluates the alignment of the custom evaluator
     Args:
         args (dict): A dictionary of arguments including input data path and other configurations.
+        plot (bool): Show the confusion matrix as a heatmap, disable for automated runs.
     Returns:
         None
     """
 
-    evaluate_results = evaluate(
-        data=alignment_data_path,
-        evaluators={
-            "citation": CitationEvaluator(model_config_dict={
-                "api_version": os.getenv("AZURE_OPENAI_API_VERSION"),
-                "azure_endpoint": os.getenv("AZURE_OPENAI_ENDPOINT"),
-                "api_key": os.getenv("AZURE_OPENAI_API_KEY")
-            })
-        },
-        evaluator_config={
-            "citation": {
-                "column_mapping": {
-                    "question": "${data.question}",
-                    "chatbot_answer": "${data.chatbot_answer}"
-                }
-            },
-        },
-    )
-
-    eval_result = pd.DataFrame(evaluate_results["rows"])
+    # Strict, every answer goes to the LLM judge instead of the inline citation shortcut
+    evaluator = CitationEvaluator(model_config_dict={
+        "api_version": os.getenv("AZURE_OPENAI_API_VERSION"),
+        "azure_endpoint": os.getenv("AZURE_OPENAI_ENDPOINT"),
+        "api_key": os.getenv("AZURE_OPENAI_API_KEY")
+    }, strict=True)
+
+    # A single event loop for all chunks, the evaluator's async client is bound to it
+    eval_result = asyncio.run(evaluate_alignment_data(evaluator, alignment_data_path))
     
     print(eval_result)
 
@@ -49,8 +45,8 @@ def evaluate_alignment(alignment_data_path):
     human_labels = normalize_labels(eval_result["inputs.human_label"])
 
     # Get misaligned rows
-    misaligned_mask = [eval_label != human_label for eval_label, human_label in zip(evaluator_labels, human_labels)]
-    misaligned_rows = eval_result[misaligned_mask]
+    misaligned_mask = evaluator_labels != human_labels
+    misaligned_rows = eval_result.loc[misaligned_mask]
     if len(misaligned_rows) > 0:
         for idx, reason in enumerate(misaligned_rows['outputs.citation.reason']):
             print(f"{idx+1}. {reason}")
@@ -68,8 +64,19 @@ def evaluate_alignment(alignment_data_path):
         "κ ≥ 0.80: Almost perfect agreement")
 
 
-    # Calculate the confusion matrix
-    cm = confusion_matrix(human_labels, evaluator_labels)
+    # Calculate the confusion matrix, rows are the human labels and columns the evaluator labels
+    cm = np.bincount(
+        human_labels.astype(np.int8) * 2 + evaluator_labels.astype(np.int8),
+        minlength=4
+    ).reshape(2, 2)
+    print(f"Confusion matrix:\n{cm}")
+
+    if not plot:
+        return
+
+    # Imported here so runs without a plot skip the matplotlib and seaborn startup cost
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
     # Plot the confusion matrix
     plt.figure(figsize=(10, 7))
@@ -79,39 +86,72 @@ def evaluate_alignment(alignment_data_path):
     plt.title('Confusion Matrix')
     plt.show()
 
+async def evaluate_alignment_data(evaluator, alignment_data_path):
+    """
+    Stream the alignment data CHUNK_SIZE rows at a time and evaluate each chunk
+    Args:
+        evaluator: Evaluator exposing an async __acall__.
+        alignment_data_path (str): Path to the JSONL alignment data.
+    Returns:
+        pd.DataFrame: The questions and human labels with the evaluator outputs, in the
+        column layout of the rows returned by azure.ai.evaluation.evaluate.
+    """
+    chunk_results = []
+    with pd.read_json(alignment_data_path, lines=True, dtype=False, chunksize=CHUNK_SIZE) as reader:
+        for chunk in reader:
+            outputs = await evaluate_rows(evaluator, chunk.to_dict(orient='records'))
+            # Only keep what is needed for the comparison, not the full chatbot answers
+            chunk_results.append(pd.concat([
+                chunk[["question", "human_label"]].add_prefix("inputs."),
+                pd.DataFrame(outputs, index=chunk.index).add_prefix("outputs.citation.")
+            ], axis=1))
+
+    if not chunk_results:
+        raise ValueError(f"No alignment data found in {alignment_data_path}")
+    return pd.concat(chunk_results, ignore_index=True)
+
+async def evaluate_rows(evaluator, rows):
+    """
+    Run the evaluator over the rows, BATCH_SIZE rows at a time
+    Args:
+        evaluator: Evaluator exposing an async __acall__.
+        rows (list): The alignment data rows.
+    Returns:
+        list: The evaluator output of every row, in input order.
+    """
+    outputs = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        outputs += await asyncio.gather(*(
+            evaluator.__acall__(question=row["question"], chatbot_answer=row["chatbot_answer"])
+            for row in batch
+        ))
+    return outputs
+
 # Should be moved to a utility module
+_LABEL_MAP = {
+    'true': True, '1': True, 'yes': True, 'y': True,
+    'false': False, '0': False, 'no': False, 'n': False
+}
+
 def normalize_labels(labels):
     """
-    Normalize labels to boolean values, handling various string representations
+    Normalize labels to a NumPy array of booleans, handling various string representations
     """
-    normalized = []
-    for label in labels:
-        if isinstance(label, str):
-            # Convert to lowercase and strip whitespace
-            label_str = label.lower().strip()
-            # Handle various true representations
-            if label_str in ['true', '1', 'yes', 'y']:
-                normalized.append(True)
-            # Handle various false representations
-            elif label_str in ['false', '0', 'no', 'n']:
-                normalized.append(False)
-            else:
-                # If it's an unexpected string, try to evaluate it as boolean
-                try:
-                    normalized.append(bool(eval(label_str.title())))
-                except:
-                    # Default to False if unable to parse
-                    print(f"Warning: Unable to parse label '{label}', defaulting to False")
-                    normalized.append(False)
-        elif isinstance(label, bool):
-            normalized.append(label)
-        elif isinstance(label, (int, float)):
-            normalized.append(bool(label))
-        else:
-            # Default to False for any other type
-            print(f"Warning: Unexpected label type '{type(label)}' for value '{label}', defaulting to False")
-            normalized.append(False)
-    return normalized
+    labels = pd.Series(labels, dtype=object).reset_index(drop=True)
+    is_string = labels.map(type).eq(str)
+
+    # Strings are looked up in the label map
+    string_labels = labels[is_string].str.lower().str.strip().map(_LABEL_MAP)
+    # Booleans and numbers are truthy when non-zero, any other type is not a label
+    other_labels = pd.to_numeric(labels[~is_string], errors='coerce')
+
+    unparsed = labels[is_string][string_labels.isna()].tolist() + labels[~is_string][other_labels.isna()].tolist()
+    if unparsed:
+        print(f"Warning: Unable to parse labels {unparsed}, defaulting to False")
+
+    normalized = pd.concat([string_labels, other_labels.ne(0) & other_labels.notna()]).sort_index()
+    return normalized.fillna(False).astype(bool).to_numpy()
 
 if __name__ == "__main__":
 
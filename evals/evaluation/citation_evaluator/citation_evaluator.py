@@ -1,5 +1,7 @@
-from openai import AzureOpenAI
+import re
+import httpx
 from pydantic import BaseModel
+from evaluation.base_evaluator import BaseEvaluator
 
 citation_evaluator_prompt = """
 You are evaluating whether a chatbot response meets the citation requirements.
@@ -22,17 +24,18 @@ Citations are embedded inline in the text using this format:
 ## Your task:
 Evaluate whether the chatbot correctly followed the citation rule in its response.
 
-Return your evaluation in the following structured format:
+Return your evaluation as a JSON object with the following keys:
 
-class CitationEvaluationResponse(BaseModel):
-    is_valid: bool  # True if the citation behavior is correct, False otherwise
-    reason: str     # A brief explanation of your reasoning
+{
+    "is_valid": true or false,  # true if the citation behavior is correct, false otherwise
+    "reason": "..."             # A brief explanation of your reasoning
+}
 
 When generating your response:
 
-Set is_valid = True if the chatbot made the correct decision about whether to include a citation (based on whether the content is organization-specific/internal or general knowledge).
+Set is_valid = true if the chatbot made the correct decision about whether to include a citation (based on whether the content is organization-specific/internal or general knowledge).
 
-Set is_valid = False if the chatbot failed to include a citation when it should have, or included one unnecessarily.
+Set is_valid = false if the chatbot failed to include a citation when it should have, or included one unnecessarily.
 
 In the reason, explain whether the content is internal/organization-specific or general knowledge, and justify whether the inclusion or absence of citations is appropriate.
 
@@ -40,53 +43,40 @@ Note: Your task is only to evaluate whether a citation is present when required.
 """
 
 
+# Inline citation, for example [citationIndex-2]
+_CITATION_RE = re.compile(r"\[citationIndex-\d+\]")
+
+
 class CitationEvaluationResponse(BaseModel):
     is_valid: bool
     reason: str
 
 
-class CitationEvaluator:
+class CitationEvaluator(BaseEvaluator):
+
+    NAME = "citation"
+    SYSTEM_PROMPT = citation_evaluator_prompt
+    USER_PROMPT_TEMPLATE = "Question: {question} Answer: {chatbot_answer}"
+    RESPONSE_MODEL = CitationEvaluationResponse
+
     def __init__(
             self,
-            model_config_dict: dict
-        ):
-        # Initialize the citation evaluator
-        self.model_config = model_config_dict
-
-    def __call__(
-            self, 
-            question: str,
-            chatbot_answer: str,
+            model_config_dict: dict,
+            async_http_client: httpx.AsyncClient = None,
+            cache=None,
+            strict: bool = True
         ):
-
-
-        # ---- Remove to get a more nuanced evaluation ----
-        # If the answer include any citations, it passes for now
-        """
-    if "[citationIndex-" in chatbot_answer:
-            return {"is_valid": True, "reason": "The answer includes citations"}
-        """
-
-        llm_client = AzureOpenAI(
-            api_version=self.model_config["api_version"],
-            azure_endpoint=self.model_config["azure_endpoint"],
-            api_key=self.model_config["api_key"]
+        super().__init__(
+            model_config_dict=model_config_dict,
+            async_http_client=async_http_client,
+            cache=cache
         )
-
-        result = llm_client.beta.chat.completions.parse(
-            model="gpt-4.1",
-            messages=[
-                {"role": "system", "content": citation_evaluator_prompt},
-                {"role": "user", "content": f"Question: {question} Answer: {chatbot_answer}"}
-            ],
-            response_format=CitationEvaluationResponse,
-            max_completion_tokens=200,
-            temperature=0.0,
-            #top_p=1.0,
-            frequency_penalty=0.0,
-            presence_penalty=0.0,
-        )
-
-        citation_result = result.choices[0].message.parsed
-
-        return citation_result.model_dump()
\ No newline at end of file
+        # With strict=False, answers with an inline citation pass without calling the LLM. Strict by
+        # default, so the alignment scripts measure the LLM judge and not the shortcut
+        self.strict = strict
+
+    def _get_fast_path_result(self, chatbot_answer: str, **inputs) -> dict | None:
+        # If the answer include any citations, it passes (strict=True sends every answer to the LLM)
+        if not self.strict and _CITATION_RE.search(chatbot_answer):
+            return {"is_valid": True, "reason": "Inline citation detected"}
+        return None
@@ -1,11 +1,13 @@
+import asyncio
 import os
 from dotenv import load_dotenv
 load_dotenv()
 from datetime import datetime
+import httpx
 import pandas as pd
+import xlsxwriter
 from openai import AzureOpenAI
 from azure.ai.evaluation import (
-    evaluate, 
     AzureOpenAIModelConfiguration,
     RelevanceEvaluator,
     GroundednessEvaluator
@@ -13,8 +15,21 @@ from azure.ai.evaluation import (
 from evaluation.citation_evaluator.citation_evaluator import CitationEvaluator
 from evaluation.correct_evaluator.correct_evaluator_evaluator import CorrectEvaluator
 from evaluation.completeness_evaluator.completeness_evaluator import CompletenessEvaluator
+from evaluation.parallel_evaluator_runner import ParallelEvaluatorRunner
+from evaluation.evaluator_cache import EvaluatorCache
 
 class EvaluationFactory:
+
+    # Result columns not needed in the report (*_result, *_results, *_threshold and gpt_* columns)
+    _DROPPED_COLUMNS_PATTERN = r'(?:_results?|_threshold)$|gpt'
+
+    # Stream rows to disk and keep cell values as plain strings
+    _EXCEL_OPTIONS = {
+        'constant_memory': True,
+        'strings_to_formulas': False,
+        'strings_to_urls': False
+    }
+
     def __init__(
             self, 
             model_config: AzureOpenAIModelConfiguration,
@@ -35,55 +50,7 @@ class EvaluationFactory:
 
 
     def run_evaluation(self):
-        result = evaluate(
-            model_config=self.model_config,
-            data=self.input_file, # Provide your data here:
-            evaluators={
-                "relevance": RelevanceEvaluator(model_config=self.model_config),
-                "groundedness": GroundednessEvaluator(model_config=self.model_config),
-                "citation": CitationEvaluator(model_config_dict=self.evaluator_config),
-                "correct": CorrectEvaluator(model_config_dict=self.evaluator_config),
-                "completeness": CompletenessEvaluator(model_config_dict=self.evaluator_config)
-            },
-            # Column mapping:
-            evaluator_config={
-                "relevance": {
-                    "column_mapping": {
-                        "query": "${data.question}",
-                        "response": "${data.chatbot_answer}"
-                    }
-                },
-                "groundedness": {
-                    "column_mapping": {
-                        "query": "${data.question}",
-                        "context": "${data.chunk_content}",
-                        "response": "${data.ground_truth_answer}"
-                    }
-                },
-                "citation": {
-                    "column_mapping": {
-                        "question": "${data.question}",
-                        "chatbot_answer": "${data.chatbot_answer}"
-                    }
-                },
-                "correct": {
-                    "column_mapping": {
-                        "question": "${data.question}",
-                        "chatbot_answer": "${data.chatbot_answer}",
-                        "ground_truth_answer": "${data.ground_truth_answer}"
-                    }
-                },
-                "completeness": {
-                    "column_mapping": {
-                        "question": "${data.question}",
-                        "chatbot_answer": "${data.chatbot_answer}",
-                        "ground_truth_answer": "${data.ground_truth_answer}"
-                    }
-                }
-            },
-
-            output_path=self.output_file
-        )
+        result = asyncio.run(self._evaluate())
 
         # -- Make the result more easily consumable --
      
@@ -99,6 +66,74 @@ class EvaluationFactory:
 
         return result, df_rows, df_kpis
     
+    async def _evaluate(self):
+        """Run the evaluators over the input file, the clients are closed once all rows are evaluated."""
+        # One connection pool shared by the custom evaluators
+        async with httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+        ) as async_http_client:
+            # Shared by the custom evaluators, reuses judgements from earlier runs
+            evaluator_cache = EvaluatorCache()
+
+            # Runs the evaluators of each row concurrently instead of one after another
+            runner = ParallelEvaluatorRunner(
+                evaluators={
+                    "relevance": RelevanceEvaluator(model_config=self.model_config),
+                    "groundedness": GroundednessEvaluator(model_config=self.model_config),
+                    # Not strict, answers with an inline citation pass without an LLM call
+                    "citation": CitationEvaluator(model_config_dict=self.evaluator_config, async_http_client=async_http_client, cache=evaluator_cache, strict=False),
+                    "correct": CorrectEvaluator(model_config_dict=self.evaluator_config, async_http_client=async_http_client, cache=evaluator_cache),
+                    "completeness": CompletenessEvaluator(model_config_dict=self.evaluator_config, async_http_client=async_http_client, cache=evaluator_cache)
+                },
+                # Column mapping:
+                evaluator_config={
+                    "relevance": {
+                        "column_mapping": {
+                            "query": "${data.question}",
+                            "response": "${data.chatbot_answer}"
+                        }
+                    },
+                    "groundedness": {
+                        "column_mapping": {
+                            "query": "${data.question}",
+                            "context": "${data.chunk_content}",
+                            "response": "${data.ground_truth_answer}"
+                        }
+                    },
+                    "citation": {
+                        "column_mapping": {
+                            "question": "${data.question}",
+                            "chatbot_answer": "${data.chatbot_answer}"
+                        }
+                    },
+                    "correct": {
+                        "column_mapping": {
+                            "question": "${data.question}",
+                            "chatbot_answer": "${data.chatbot_answer}",
+                            "ground_truth_answer": "${data.ground_truth_answer}"
+                        }
+                    },
+                    "completeness": {
+                        "column_mapping": {
+                            "question": "${data.question}",
+                            "chatbot_answer": "${data.chatbot_answer}",
+                            "ground_truth_answer": "${data.ground_truth_answer}"
+                        }
+                    }
+                }
+            )
+
+            try:
+                return await runner.arun(
+                    data=self.input_file, # Provide your data here:
+                    output_path=self.output_file
+                )
+            finally:
+                for evaluator in runner.evaluators.values():
+                    if hasattr(evaluator, "aclose"):
+                        await evaluator.aclose()
+
     def _get_aggregated_kpis(self, df_rows):
         """
         Calculate aggregated KPIs from the DataFrame.
@@ -107,39 +142,35 @@ class EvaluationFactory:
             df_rows: DataFrame containing evaluation results.
         
         Returns:
-            A pandas DataFrame with aggregated KPIs ready for Excel export.
+            A pandas DataFrame with one row per metric and one column per statistic,
+            ready for the KPI_Summary sheet.
         """
         numeric_cols = df_rows.select_dtypes(include='number')
         boolean_cols = df_rows.select_dtypes(include='bool')
 
-        # Create a list to store all KPI rows
-        kpi_rows = []
-        
-        # Add numeric statistics
+        kpi_frames = []
+
+        # Add numeric statistics, all three computed in a single agg call
         if not numeric_cols.empty:
-            for stat_name, stat_func in [('mean', numeric_cols.mean()), 
-                                        ('std', numeric_cols.std()), 
-                                        ('median', numeric_cols.median())]:
-                for col_name, value in stat_func.items():
-                    kpi_rows.append({
-                        'metric': col_name,
-                        'statistic': stat_name,
-                        'value': value
-                    })
-        
+            kpi_frames.append(numeric_cols.agg(['mean', 'std', 'median']).T)
+
         # Add boolean statistics
         if not boolean_cols.empty:
-            for col_name in boolean_cols.columns:
-                kpi_rows.append({
-                    'metric': col_name,
-                    'statistic': 'percentage_true',
-                    'value': boolean_cols[col_name].mean()
-                })
-        
+            kpi_frames.append(boolean_cols.mean().to_frame('percentage_true'))
+
         # Convert to DataFrame
-        kpis_df = pd.DataFrame(kpi_rows)
+        if not kpi_frames:
+            kpis_df = pd.DataFrame(columns=['mean', 'std', 'median', 'percentage_true'])
+        else:
+            kpis_df = pd.concat(kpi_frames)
+        kpis_df = kpis_df.rename_axis(index='metric', columns='statistic')
         
         return kpis_df
+
+    @staticmethod
+    def _get_long_form_kpis(df_kpis):
+        """Return the KPIs as metric/statistic/value rows, statistics not computed for a metric are left out."""
+        return df_kpis.stack().dropna().rename('value').reset_index()
     
     def _get_dataframe(self, result_json):
         """
@@ -153,8 +184,9 @@ class EvaluationFactory:
             A pandas DataFrame containing the evaluation results.
         """
         df_rows = pd.DataFrame(result_json["rows"])
-        cols_to_drop = [col for col in df_rows.columns if col.endswith('_results') or col.endswith('_threshold') or col.endswith('_result') or 'gpt' in col]
-        df_rows = df_rows.drop(columns=cols_to_drop)
+        # Single vectorized scan of the column names
+        cols_to_drop = df_rows.columns.str.contains(self._DROPPED_COLUMNS_PATTERN, regex=True)
+        df_rows = df_rows.loc[:, ~cols_to_drop]
         return df_rows
     
 
@@ -170,20 +202,38 @@ class EvaluationFactory:
             The path to the created Excel file.
         """
 
-        # Create Excel writer
-        with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
+        # Create Excel writer, constant memory mode streams each row to disk once it is written
+        with xlsxwriter.Workbook(excel_path, self._EXCEL_OPTIONS) as workbook:
             # Save detailed results
-            df_rows.to_excel(writer, sheet_name='Detailed_Results', index=False)
+            self._write_sheet(workbook, 'Detailed_Results', df_rows)
             
             # Save aggregated KPIs
-            df_kpis.to_excel(writer, sheet_name='KPIs', index=False)
+            self._write_sheet(workbook, 'KPIs', self._get_long_form_kpis(df_kpis))
             
-            # Create a summary sheet with pivot table style view
+            # Create a summary sheet with pivot table style view, df_kpis is already in that form
             if not df_kpis.empty:
-                summary_pivot = df_kpis.pivot(index='metric', columns='statistic', values='value')
-                summary_pivot.to_excel(writer, sheet_name='KPI_Summary')
+                self._write_sheet(workbook, 'KPI_Summary', df_kpis.reset_index())
         
         return excel_path
+
+    @staticmethod
+    def _write_sheet(workbook, sheet_name, df):
+        """
+        Write a DataFrame to a new worksheet.
+
+        Rows are written one after another since constant memory mode cannot go back to
+        a row once the next one is started. DataFrame.to_excel writes column by column.
+        """
+        worksheet = workbook.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, [str(column) for column in df.columns])
+
+        # Missing values become empty cells, values Excel has no type for are written as text
+        values = df.astype(object).where(df.notna(), None)
+        for row_index, row in enumerate(values.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row_index, 0, [
+                value if value is None or isinstance(value, (str, bool, int, float)) else str(value)
+                for value in row
+            ])
     
     def _create_output_file(self, file_extension: str):
         """Create an output file path.
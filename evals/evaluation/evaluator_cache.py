@@ -0,0 +1,37 @@
+import hashlib
+import diskcache
+
+class EvaluatorCache:
+    """
+    Persistent cache for the responses of the LLM based evaluators.
+
+    The evaluators call the model with temperature 0.0, so the same prompt gives the same
+    judgement. Results are stored on disk and reused across evaluation runs. Entries are keyed
+    on the evaluator name and a SHA-256 hash of the model, system prompt and user prompt, so a
+    prompt change invalidates the cached results of that evaluator only.
+    """
+
+    DEFAULT_DIRECTORY = "./.eval_cache"
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        self._cache = diskcache.Cache(directory)
+
+    def get(self, evaluator_name: str, model: str, system_prompt: str, user_prompt: str):
+        """
+        Get a cached evaluation result.
+
+        Returns:
+            The cached result dict, or None if the prompt has not been evaluated before.
+        """
+        return self._cache.get(self._get_key(evaluator_name, model, system_prompt, user_prompt))
+
+    def set(self, evaluator_name: str, model: str, system_prompt: str, user_prompt: str, result: dict):
+        """Store an evaluation result."""
+        self._cache.set(self._get_key(evaluator_name, model, system_prompt, user_prompt), result)
+
+    @staticmethod
+    def _get_key(evaluator_name: str, model: str, system_prompt: str, user_prompt: str) -> tuple:
+        prompt_hash = hashlib.sha256(
+            "\x1f".join((model, system_prompt, user_prompt)).encode("utf-8")
+        ).hexdigest()
+        return (evaluator_name, prompt_hash)
@@ -1,7 +1,9 @@
+import asyncio
 import os
 import warnings
 from dotenv import load_dotenv
 load_dotenv()
+import httpx
 import pandas as pd
 import urllib3
 # Suppress urllib3 InsecureRequestWarning for localhost HTTPS requests
@@ -9,29 +11,35 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 from openai import AzureOpenAI
 from azure.ai.evaluation import AzureOpenAIModelConfiguration
-from answer_generation import AuthService, AnswerFactory, AnswerGenerator
+from answer_generation import AuthService, AnswerFactory, AsyncAnswerGenerator
 from evaluation.evaluation_factory import EvaluationFactory
 from visualizer.visualizer import Visualizer
 
 # The path to question & answers used as input to the evaluation
 input_file_path = "data/q-a/qa_generated_20250711_141152.json"
 
-def main():
-    auth_service = AuthService()
+async def generate_answers(auth_service: AuthService) -> str:
+    # One client for the whole run so all questions share its connection pool
+    async with httpx.AsyncClient(verify=False, http2=True, timeout=httpx.Timeout(120.0, connect=10.0)) as http_client:
+        chatbot_answer_generator = AsyncAnswerGenerator(
+            base_url=os.getenv("CHATBOT_BACKEND_ENDPOINT"),
+            auth_service=auth_service,
+            expert_identifier=os.getenv("CHATBOT_EXPERT_IDENTIFIER"),
+            http_client=http_client
+        )
 
-    chatbot_answer_generator = AnswerGenerator(
-        base_url=os.getenv("CHATBOT_BACKEND_ENDPOINT"),
-        auth_service=auth_service,
-        expert_identifier=os.getenv("CHATBOT_EXPERT_IDENTIFIER")
-    )
+        answer_factory = AnswerFactory(
+            answer_generator=chatbot_answer_generator,
+            input_file_path=input_file_path,
+            output_folder_path="data/chatbot-answers/"
+        )
 
-    answer_factory = AnswerFactory(
-        answer_generator=chatbot_answer_generator,
-        input_file_path=input_file_path,
-        output_folder_path="data/chatbot-answers/"
-    )
+        return await answer_factory.arun()
+
+def main():
+    auth_service = AuthService()
 
-    answer_factory.run()
+    chatbot_answers_path = asyncio.run(generate_answers(auth_service))
 
     model_config = AzureOpenAIModelConfiguration(
         azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
@@ -42,7 +50,7 @@ def main():
 
     evaluation_factory = EvaluationFactory(
         model_config=model_config,
-    input_file=answer_factory.output_file_path,
+        input_file=chatbot_answers_path,
         output_folder_base="data/eval_results/",
     )
 
@@ -52,7 +60,9 @@ def main():
         #eval_result=eval_result,
         df_rows=df_rows,
         #df_kpis=df_kpis,
-        output_folder=evaluation_factory.output_folder_full
+        output_folder=evaluation_factory.output_folder_full,
+        # Batch run, the figures are saved without blocking on a window per figure
+        interactive=False
     )
 
     visualizer.visualize()
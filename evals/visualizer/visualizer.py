@@ -1,13 +1,34 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 from pathlib import Path
 
+# Boolean-like values (lowercased) grouped together in the boolean charts
+_TRUE_VALUES = frozenset({'true', '1', 'yes', 'pass'})
+_FALSE_VALUES = frozenset({'false', '0', 'no', 'fail'})
+
+# Value sets (lowercased) that make a column boolean-like
+_TRUE_FALSE = frozenset({'true', 'false'})
+_PASS_FAIL = frozenset({'pass', 'fail'})
+
 class Visualizer:
-    def __init__(self, df_rows: pd.DataFrame, output_folder: str):
+
+    # matplotlib.pyplot and seaborn, imported on the first visualize() call and shared by all instances
+    _plt = None
+    _sns = None
+
+    def __init__(self, df_rows: pd.DataFrame, output_folder: str, interactive: bool = True):
+        """
+        Args:
+            df_rows: DataFrame containing evaluation results.
+            output_folder: Folder the figures are saved to.
+            interactive: Show the figures after saving them (e.g. in a notebook). With False the
+                figures are only saved and closed right away. The matplotlib backend is left as
+                configured, set MPLBACKEND=Agg to render without a GUI backend.
+        """
         self.df_rows = df_rows
         self.output_folder = output_folder
+        self.interactive = interactive
         Path(self.output_folder).mkdir(parents=True, exist_ok=True)
 
     def visualize(self):
@@ -15,14 +36,18 @@ class Visualizer:
         if self.df_rows is None or self.df_rows.empty:
             print("No data available for visualization.")
             return
-        numerical_cols = self.df_rows.select_dtypes(include=['number']).columns.tolist()
+        # One walk over the dtypes classifies the columns, only object and numeric columns need a value scan
+        kinds = {col: dtype.kind for col, dtype in self.df_rows.dtypes.items()}
+        numerical_cols = [col for col, kind in kinds.items() if kind in 'iufc']
         
         if not numerical_cols:
             print("No numerical columns found.")
             return
         
+        self._load_plotting_modules()
+
         # Set clean style
-        sns.set_style("whitegrid")
+        self._sns.set_style("whitegrid")
         
         # Create histograms
         self._create_histograms(numerical_cols)
@@ -32,114 +57,132 @@ class Visualizer:
             self._create_boxplots(numerical_cols)
         
         # Create visualizations for boolean data only (no categorical)
-        boolean_cols = self._identify_boolean_columns()
+        boolean_cols = self._identify_boolean_columns(kinds)
         if boolean_cols:
             self._create_boolean_charts(boolean_cols)
 
-    def _identify_boolean_columns(self):
-        """Identify columns that contain boolean-like data."""
+    def _identify_boolean_columns(self, kinds: dict):
+        """
+        Identify columns that contain boolean-like data.
+
+        Args:
+            kinds: Dtype kind of each column, as computed in visualize().
+        """
         boolean_cols = []
         
-        for col in self.df_rows.columns:
+        for col, kind in kinds.items():
+            # Check for explicit boolean columns
+            if kind == 'b':
+                boolean_cols.append(col)
+                continue
+
+            # Numeric 0/1 columns (e.g. pass/fail results) are charted as booleans as well
+            if kind in 'iuf':
+                if set(pd.unique(self.df_rows[col].dropna().to_numpy())) <= {0, 1}:
+                    boolean_cols.append(col)
+                continue
+
+            # Datetime columns can't hold boolean-like strings
+            if kind != 'O':
+                continue
+
+            column = self.df_rows[col]
             try:
+                # Hash based unique, the checks below only look at the distinct values
+                unique_vals = pd.unique(column.dropna().to_numpy())
+            except TypeError as e:
                 # Skip columns with complex data types (dicts, lists, etc.)
-                if self.df_rows[col].dtype == 'object':
-                    # Check if any values are unhashable (dict, list, etc.)
-                    sample_data = self.df_rows[col].dropna().head(10)
-                    if any(isinstance(val, (dict, list)) for val in sample_data):
-                        continue
-                
-                unique_vals = self.df_rows[col].dropna().unique()
-                
-                # Check for explicit boolean columns
-                if self.df_rows[col].dtype == bool:
-                    boolean_cols.append(col)
-                # Check for True/False strings
-                elif set(str(v).lower() for v in unique_vals if pd.notna(v)).issubset({'true', 'false'}):
-                    boolean_cols.append(col)
-                # Check for actual boolean values mixed with strings
-                elif set(unique_vals).issubset({True, False}):
-                    boolean_cols.append(col)
-                # Check for pass/fail pattern
-                elif set(str(v).lower() for v in unique_vals if pd.notna(v)).issubset({'pass', 'fail'}):
-                    boolean_cols.append(col)
-                    
-            except (TypeError, ValueError) as e:
-                # Skip columns that cause errors (likely contain unhashable types)
                 print(f"Skipping column '{col}' due to data type issues: {str(e)[:100]}")
                 continue
+
+            lowered_vals = {str(v).lower() for v in unique_vals}
+
+            # Check for True/False strings or pass/fail pattern
+            if lowered_vals <= _TRUE_FALSE or lowered_vals <= _PASS_FAIL:
+                boolean_cols.append(col)
+            # Check for actual boolean values mixed with strings
+            elif set(unique_vals) <= {True, False}:
+                boolean_cols.append(col)
         
         return boolean_cols
 
     def _create_histograms(self, numerical_cols):
         """Create simple histograms for each numerical column."""
-        n_cols = len(numerical_cols)
-        fig, axes = plt.subplots(1, n_cols, figsize=(4 * n_cols, 4))
-        
-        if n_cols == 1:
-            axes = [axes]
-        
-        for i, col in enumerate(numerical_cols):
-            data = self.df_rows[col].dropna()
-            axes[i].hist(data, bins=15, alpha=0.7, color='skyblue')
-            axes[i].set_title(f'{col}')
-            axes[i].set_xlabel('Value')
-            axes[i].set_ylabel('Count')
-        
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_folder, 'histograms.png'), dpi=150)
-        plt.show()
+        # One figure-level call on the long-form data lays out all the Axes in one pass
+        long_form = self.df_rows[numerical_cols].melt(var_name='metric', value_name='value').dropna()
+        grid = self._sns.displot(
+            long_form,
+            x='value',
+            col='metric',
+            col_wrap=min(len(numerical_cols), 4),
+            bins=15,
+            height=3,
+            facet_kws={'sharex': False, 'sharey': False},
+            alpha=0.7,
+            color='skyblue'
+        )
+        grid.set_titles('{col_name}')
+        grid.set_axis_labels('Value', 'Count')
+        grid.savefig(os.path.join(self.output_folder, 'histograms.png'), dpi=150)
+        self._show_or_close(grid.figure)
 
     def _create_boxplots(self, numerical_cols):
         """Create box plots for comparison."""
-        plt.figure(figsize=(8, 6))
-        self.df_rows[numerical_cols].boxplot()
-        plt.title('Score Comparison')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_folder, 'boxplots.png'), dpi=150)
-        plt.show()
+        # Five-number summaries of all columns in one numpy pass, whiskers at min and max
+        values = self.df_rows[numerical_cols].to_numpy(dtype=float, na_value=np.nan)
+        q = np.nanpercentile(values, [0, 25, 50, 75, 100], axis=0)
+        stats = [
+            {'label': col, 'whislo': q[0, i], 'q1': q[1, i], 'med': q[2, i], 'q3': q[3, i], 'whishi': q[4, i], 'fliers': []}
+            for i, col in enumerate(numerical_cols)
+        ]
+
+        fig, ax = self._plt.subplots(figsize=(8, 6))
+        ax.bxp(stats, showfliers=False)
+        ax.set_title('Score Comparison')
+        ax.tick_params(axis='x', labelrotation=45)
+        self._plt.tight_layout()
+        self._plt.savefig(os.path.join(self.output_folder, 'boxplots.png'), dpi=150)
+        self._show_or_close(fig)
 
     def _create_boolean_charts(self, boolean_cols):
         """Create bar charts for boolean columns."""
         n_cols = len(boolean_cols)
         if n_cols == 0:
             return
+
+        if n_cols > 4:
+            # If more than 4 columns, create multiple figures
+            self._create_boolean_charts_multiple_figures(boolean_cols)
+            return
             
-        fig, axes = plt.subplots(1, min(n_cols, 4), figsize=(4 * min(n_cols, 4), 4))
+        fig, axes = self._plt.subplots(1, n_cols, figsize=(4 * n_cols, 4))
         
         if n_cols == 1:
             axes = [axes]
-        elif n_cols > 4:
-            # If more than 4 columns, create multiple figures
-            self._create_boolean_charts_multiple_figures(boolean_cols)
-            return
         
         for i, col in enumerate(boolean_cols[:4]):
             # Convert to standardized format for counting
             data = self.df_rows[col].dropna()
             
             # Normalize boolean-like values
-            normalized_data = data.apply(self._normalize_boolean_value)
+            normalized_data = self._normalize_boolean_values(data)
             value_counts = normalized_data.value_counts()
             
             # Create bar chart
-            colors = ['lightcoral' if 'False' in str(k) or 'Fail' in str(k) else 'lightgreen' 
-                     for k in value_counts.index]
+            labels = value_counts.index.astype(str)
+            heights = value_counts.to_numpy()
+            colors = np.where(labels.str.contains('False|Fail', regex=True), 'lightcoral', 'lightgreen')
             
-            bars = axes[i].bar(value_counts.index, value_counts.values, color=colors, alpha=0.7)
+            bars = axes[i].bar(labels, heights, color=colors, alpha=0.7)
             axes[i].set_title(f'{col}\n(n={len(data)})')
             axes[i].set_ylabel('Count')
             
             # Add value labels on bars
-            for bar in bars:
-                height = bar.get_height()
-                axes[i].text(bar.get_x() + bar.get_width()/2., height + height*0.01,
-                           f'{int(height)}', ha='center', va='bottom')
+            axes[i].bar_label(bars, labels=[str(int(height)) for height in heights])
         
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_folder, 'boolean_metrics.png'), dpi=150, bbox_inches='tight')
-        plt.show()
+        self._plt.tight_layout()
+        self._plt.savefig(os.path.join(self.output_folder, 'boolean_metrics.png'), dpi=150, bbox_inches='tight')
+        self._show_or_close(fig)
 
     def _create_boolean_charts_multiple_figures(self, boolean_cols):
         """Create multiple figures if there are many boolean columns."""
@@ -147,16 +190,30 @@ class Visualizer:
             chunk = boolean_cols[i:i+4]
             self._create_boolean_charts(chunk)
 
-    def _normalize_boolean_value(self, value):
-        """Normalize different boolean representations to standard format."""
-        if pd.isna(value):
-            return 'Unknown'
-        
-        str_val = str(value).lower()
-        
-        if str_val in ['true', '1', 'yes', 'pass']:
-            return 'True/Pass'
-        elif str_val in ['false', '0', 'no', 'fail']:
-            return 'False/Fail'
+    def _load_plotting_modules(self):
+        """Import matplotlib and seaborn the first time they are needed."""
+        if Visualizer._plt is None:
+            import matplotlib.pyplot as plt
+            import seaborn as sns
+            Visualizer._plt = plt
+            Visualizer._sns = sns
+
+    def _show_or_close(self, fig):
+        """Show the figure in interactive mode, otherwise free it right after saving."""
+        if self.interactive:
+            self._plt.show()
         else:
-            return str(value)
\ No newline at end of file
+            self._plt.close(fig)
+
+    def _normalize_boolean_values(self, data: pd.Series) -> pd.Series:
+        """Normalize different boolean representations to standard format, for the whole column at once."""
+        if data.dtype.kind in 'iuf':
+            # Numeric 0/1 column, 1.0 and 0.0 match the integer keys
+            return data.map({1: 'True/Pass', 0: 'False/Fail'}).fillna('Unknown')
+
+        str_values = data.astype(str)
+        lowered = str_values.str.lower()
+
+        normalized = str_values.mask(lowered.isin(_TRUE_VALUES), 'True/Pass')
+        normalized = normalized.mask(lowered.isin(_FALSE_VALUES), 'False/Fail')
+        return normalized.mask(data.isna(), 'Unknown')
\ No newline at end of file
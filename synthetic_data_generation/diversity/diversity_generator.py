@@ -1,84 +1,121 @@
+import threading
 import numpy as np
 from models import LengthDistributionConfig, DiversityInjection
 
+# Injection tables as (name, frequency) pairs, shared by all instances
+_TONES = (
+    ("", 5.0),
+    ("formal", 1.0),
+    ("informal", 1.5),
+    ("conversational", 2.0)
+)
+
+_DISRUPTIVE_PHRASES = (
+    ("", 5.0),
+    ("Include a few spelling errors in the question you generate.", 1.5),
+    ("Introduce a slight ambiguity in the question you generate.", 1.0)
+)
+
+_LANGUAGES = (
+    ("English", 10),
+    ("Swedish", 1),
+)
+
+
+class _AliasSampler:
+    """
+    Weighted random selection from an injection table using Walker's alias method.
+
+    The alias tables are built once (Vose's algorithm), after which a batch of n samples takes n
+    uniform indices and n uniform floats, independent of the number of names.
+    """
+
+    def __init__(self, table: tuple):
+        self.names = tuple(name for name, _ in table)
+        frequencies = np.array([frequency for _, frequency in table], dtype=float)
+
+        n = len(self.names)
+        scaled = frequencies * n / frequencies.sum()
+        self.prob = np.ones(n)
+        self.alias = np.arange(n)
+
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def sample_batch(self, rng: np.random.Generator, n: int) -> list[str]:
+        i = rng.integers(len(self.names), size=n)
+        indices = np.where(rng.random(n) < self.prob[i], i, self.alias[i])
+        return [self.names[index] for index in indices]
+
 
 class DiversityGenerator:
 
-    def __init__(self, config: LengthDistributionConfig):
+    # Number of injections drawn at once when get_diversity_injection runs out
+    BATCH_SIZE = 256
+
+    def __init__(self, config: LengthDistributionConfig, seed: int | None = None):
+        """
+        Args:
+            config: Parameters of the response length distribution.
+            seed: Seed for the random generator, for reproducible injections. Random by default.
+        """
         self.config = config
+        self._rng = np.random.default_rng(seed)
+        # Alias tables are built once instead of for every sample
+        self._tone_sampler = _AliasSampler(_TONES)
+        self._disruptive_sampler = _AliasSampler(_DISRUPTIVE_PHRASES)
+        self._language_sampler = _AliasSampler(_LANGUAGES)
+        self._injection_buffer = []
+        # Generators share this instance across threads
+        self._injection_lock = threading.Lock()
 
     def get_diversity_injection(self) -> DiversityInjection:
 
-        return DiversityInjection(
-            response_length=self._get_response_length(),
-            tone_injection=self._get_tone_injection(),
-            disruptive_injection=self._get_disruptive_injection(),
-            language_injection=self._get_language_injection()
-        )
+        # Served from a pre-sampled batch, so numpy is only called once per BATCH_SIZE injections
+        with self._injection_lock:
+            if not self._injection_buffer:
+                self._injection_buffer = self.sample_batch(self.BATCH_SIZE)
+            return self._injection_buffer.pop()
 
-    def get_injection_as_string(self, injection: DiversityInjection) -> str:
-        return (
-            f"Response Length: {injection.response_length}\n"
-            f"Tone Injection: {injection.tone_injection}\n"
-            f"Disruptive Injection: {injection.disruptive_injection}\n"
-            f"Language Injection: {injection.language_injection}\n"
-        )
-
-    def _get_response_length(self) -> int:
-        """
-        Generate a response length using a log-normal distribution and a shift.
+    def sample_batch(self, n: int) -> list[DiversityInjection]:
         """
-        mean = self.config.mean
-        sigma = self.config.sigma
-        shift = self.config.shift
+        Generate n diversity injections with one numpy call per injection field.
 
-        length = np.random.lognormal(mean=mean, sigma=sigma) + shift
-        return int(max(shift, length))
-    
-    def _get_tone_injection(self) -> str:
+        The response length comes from sample_response_lengths. The tone, disruptive
+        and language injections use weighted random selection based on frequency scores,
+        drawn from precomputed alias tables.
         """
-        Generate a tone injection based on the diversity configuration.
-        This uses weighted random selection based on frequency scores.
-        """
-        tones = [
-            {"name": "", "frequency": 5.0},
-            {"name": "formal", "frequency": 1.0},
-            {"name": "informal", "frequency": 1.5},
-            {"name": "conversational", "frequency": 2.0}
-        ]
-        
-        tone_names = [tone["name"] for tone in tones]
-        frequencies = [tone["frequency"] for tone in tones]
-        
-        return np.random.choice(tone_names, p=np.array(frequencies) / np.sum(frequencies))
+        response_lengths = self.sample_response_lengths(n)
+        tones = self._tone_sampler.sample_batch(self._rng, n)
+        disruptive_phrases = self._disruptive_sampler.sample_batch(self._rng, n)
+        languages = self._language_sampler.sample_batch(self._rng, n)
 
-    def _get_disruptive_injection(self) -> str:
-        """
-        Generate a disruptive injection based on the diversity configuration.
-        This uses weighted random selection based on frequency scores.
-        """
-        disruptive_phrases = [
-            {"name": "", "frequency": 5.0},
-            {"name": "Include a few spelling errors in the question you generate.", "frequency": 1.5},
-            {"name": "Introduce a slight ambiguity in the question you generate.", "frequency": 1.0}
+        return [
+            DiversityInjection(
+                response_length=response_length,
+                tone_injection=tone,
+                disruptive_injection=disruptive_phrase,
+                language_injection=language
+            )
+            for response_length, tone, disruptive_phrase, language in zip(
+                response_lengths.tolist(), tones, disruptive_phrases, languages
+            )
         ]
-        
-        phrase_names = [phrase["name"] for phrase in disruptive_phrases]
-        frequencies = [phrase["frequency"] for phrase in disruptive_phrases]
-        
-        return np.random.choice(phrase_names, p=np.array(frequencies) / np.sum(frequencies))
-    
-    def _get_language_injection(self) -> str:
+
+    def sample_response_lengths(self, n: int) -> np.ndarray:
         """
-        Generate a language injection based on the diversity configuration.
-        This uses weighted random selection based on frequency scores.
+        Generate n response lengths using a log-normal distribution and a shift.
         """
-        languages = [
-            {"name": "English", "frequency": 10},
-            {"name": "Swedish", "frequency": 1},
-        ]
-        
-        language_names = [lang["name"] for lang in languages]
-        frequencies = [lang["frequency"] for lang in languages]
-        
-        return np.random.choice(language_names, p=np.array(frequencies) / np.sum(frequencies))
+        shift = self.config.shift
+        lengths = self._rng.lognormal(mean=self.config.mean, sigma=self.config.sigma, size=n) + shift
+        return np.maximum(lengths, shift).astype(np.int64)
+
+    def get_injection_as_string(self, injection: DiversityInjection) -> str:
+        # Kept for backward compatibility, use DiversityInjection.as_prompt_string
+        return injection.as_prompt_string
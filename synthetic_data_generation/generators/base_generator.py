@@ -1,36 +1,96 @@
+import asyncio
+import functools
+import logging
 import sys
+import threading
+from collections import OrderedDict
 from abc import ABC, abstractmethod
 from azure.search.documents import SearchClient
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
+from opentelemetry import trace
 import diversity.diversity_generator as DiversityGenerator
 from search.search_service import SearchService
 from models import QA, QAVerificationResult, QATagged
-from tracing.telemetry import get_tracer, traced
+from tracing.llm_cache import cached_structured_completion
+from tracing.telemetry import get_prompt_attribute, get_tracer, traced
+from verification.batch_verification_queue import BatchVerificationQueue, PendingVerification
 from typing import Iterable
 
+log = logging.getLogger(__name__)
+
+# Static parts of the verification prompts, only the question and context are joined in per call
+_ANSWER_UNIQUENESS_PROMPT_PREFIX = """
+You are a helpful assistant. Your task is to verify that the answer to the question can NOT be found in the context provided.
+If the answer can NOT be found in the context, return True, otherwise return False.
+
+is_correct: True if the answer can NOT be found in the context, otherwise False.
+
+Provide a reason for your answer. The reason should be less then 30 words.
+
+Question: """
+
+_CHUNK_CONNECTION_PROMPT_PREFIX = """
+You are a helpful assistant. Your task is to verify that a comprehensive answer to a question exists in the context provided.
+
+If the answer to the question can be found in the context answer True otherwise return False.
+Provide a reason for your answer. The reason should be less then 30 words.
+
+# Context:
+"""
+
+_CONTEXT_HEADER = "\n\n# Context:\n"
+_QUESTION_HEADER = "\n\nQuestion: "
 
 class BaseGenerator(ABC):
 
     MAX_RETRIES = 10
 
+    # Number of chunk ID combinations whose search records and context are kept in memory
+    CONTEXT_CACHE_SIZE = 256
+
+    # Number of search records kept in memory by ID, taken from the documents used for generation
+    RECORD_CACHE_SIZE = 4096
+
     def __init__(
             self, 
             diversity_generator: DiversityGenerator, 
             search_client: SearchClient, 
-            llm_client: AzureOpenAI,
+            llm_client: AsyncAzureOpenAI,
+            verification_mode: str = "realtime",
     ):
+        """
+        Args:
+            diversity_generator: Samples the diversity injections.
+            search_client: Client of the Azure AI Search index the Q&A pairs are grounded on.
+            llm_client: Client used for generation and verification.
+            verification_mode: "realtime" verifies each Q&A with an immediate LLM call. "batch"
+                queues the verification prompts for an Azure OpenAI batch job, run by QAFactory.
+        """
+        if verification_mode not in ("realtime", "batch"):
+            raise ValueError(f"verification_mode must be 'realtime' or 'batch', got {verification_mode}")
+
         self.diversity_generator = diversity_generator
         self.search_service = SearchService(search_client, llm_client)
         self.llm_client = llm_client
-        self.retry_count = 0  # Initialize retry count
         self.tracer = get_tracer(f"generator-{self.__class__.__name__}")
+        self.verification_mode = verification_mode
+        self.verification_queue = BatchVerificationQueue(llm_client) if verification_mode == "batch" else None
+        # Cache bound to this instance, so the generator itself is not part of the cache key
+        self._records_and_context_cache = functools.lru_cache(maxsize=self.CONTEXT_CACHE_SIZE)(
+            self._fetch_records_and_context
+        )
+        # Written and read from the worker threads that run the searches
+        self._records_by_id = OrderedDict()
+        self._records_by_id_lock = threading.Lock()
+        # Context lookups in progress, concurrent checks of the same chunks await one lookup
+        self._context_tasks: dict[tuple[str, ...], asyncio.Future] = {}
 
     @abstractmethod
-    def generate(self) -> QATagged:
+    async def generate(self) -> QATagged:
         pass
 
     @abstractmethod
-    def _verify_qa(self, qa: QA) -> QAVerificationResult:
+    async def _verify_qa(self, qa: QA) -> QAVerificationResult:
         """
         Verify the generated Q&A for quality and accuracy.
         
@@ -46,14 +106,14 @@ class BaseGenerator(ABC):
         pass
 
     @abstractmethod
-    def _build_context(self, results: Iterable[dict]) -> str:
+    def _build_context(self, results: list[dict]) -> str:
         """
         Build a context string from the search results.
         
         This should be implemented by subclasses to format the context appropriately.
         
         Args:
-            results (Iterable[dict]): The search results to build context from.
+            results (list[dict]): The search results to build context from.
         
         Returns:
             str: The formatted context string.
@@ -61,22 +121,23 @@ class BaseGenerator(ABC):
         pass
 
 
-    @traced("generator.retry_logic")
-    def _retry_logic(self) -> QATagged:
+    def _retry_logic(self, attempt: int):
+        """
+        Log a failed attempt, or stop the program once MAX_RETRIES retries have failed.
+        
+        Args:
+            attempt (int): Number of the attempt that failed, starting at 0.
+        """
         # Check number of retries
-        if self.retry_count < self.MAX_RETRIES:
-            print("The Q&A generation failed, retrying...")
-            self.retry_count += 1
-            print(f"Retrying... Attempt {self.retry_count}")
-            # Retry generating the Q&A
-            return self.generate()
+        if attempt < self.MAX_RETRIES:
+            log.info("The Q&A generation failed, retrying... Attempt %d", attempt + 1)
         else:
-            print("Max retries reached. Giving up. Stop program")
+            log.error("Max retries reached. Giving up. Stop program")
             sys.exit(1)
 
     
     @traced("generator.verify_answer_uniqueness")
-    def _verify_qa_answer_not_in_other_chunks(self, qa: QA) -> QAVerificationResult:
+    async def _verify_qa_answer_not_in_other_chunks(self, qa: QA) -> QAVerificationResult:
         """
         Verify that the answer to the question is not found in any other chunks.
         
@@ -86,7 +147,9 @@ class BaseGenerator(ABC):
         Returns:
             bool: True if the answer is not found in other chunks, False otherwise.
         """
-        results = self.search_service.qa_search(qa)
+        # Materialized once, the search results may be a one-shot paged iterator. The search
+        # client is synchronous, so it runs in a worker thread to keep the event loop free
+        results = await asyncio.to_thread(lambda: list(self.search_service.qa_search(qa)))
 
         # If results is empty, return a verification result indicating no relevant chunks found
         if not results:
@@ -95,53 +158,15 @@ class BaseGenerator(ABC):
         try:
             context = self._build_context(results)
         except Exception as e:
-            print(f"Error building context: {e}")
+            log.error("Error building context: %s", e)
             return QAVerificationResult(is_correct=False, reason="Error building context")
 
-        system_prompt = f"""
-        You are a helpful assistant. Your task is to verify that the answer to the question can NOT be found in the context provided.
-        If the answer can NOT be found in the context, return True, otherwise return False.
-
-        is_correct: True if the answer can NOT be found in the context, otherwise False.
-
-        Provide a reason for your answer. The reason should be less then 30 words.
-
-        Question: {qa.question}
-
-        # Context:
-        {context}
-
-        """
+        system_prompt = "".join((_ANSWER_UNIQUENESS_PROMPT_PREFIX, qa.question, _CONTEXT_HEADER, context))
         
-        # Make the OpenAI call with manual tracing
-        with self.tracer.start_as_current_span("generator.openai.chat") as span:
-            span.set_attribute("gen_ai.prompt.0.content", system_prompt)
-
-            qa_validation_completion = self.llm_client.beta.chat.completions.parse(
-                model="gpt-4.1",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                ],
-                response_format=QAVerificationResult,
-                max_completion_tokens=800,
-                temperature=0.0,
-                frequency_penalty=0.0,
-                presence_penalty=0.0
-            )
-
-            qa_validation = qa_validation_completion.choices[0].message.parsed
-
-            span.set_attribute("gen_ai.qa.is_correct", qa_validation.is_correct)
-            span.set_attribute("gen_ai.qa.reason", qa_validation.reason)
-
-        # Console print
-        if not qa_validation.is_correct:
-            print(f"Q&A validation failed: {qa_validation.reason}")
-
-        return qa_validation
+        return await self._run_verification(system_prompt, "answer_uniqueness")
 
     @traced("generator.verify_chunk_connection")
-    def _verify_qa_chunk_connection(self, qa: QA) -> QAVerificationResult:
+    async def _verify_qa_chunk_connection(self, qa: QA) -> QAVerificationResult:
         """
         Verify that the generated Q&A is valid by checking if the answer can be found in the context of the chunks.
         Args:
@@ -150,94 +175,215 @@ class BaseGenerator(ABC):
         Returns:
             bool: True if valid, False otherwise.
         """
-        results = self.search_service.get_search_records_by_ids(qa.chunk_ids)
+        try:
+            context = await self._get_context_by_chunk_ids(qa.chunk_ids)
+        except Exception as e:
+            log.error("Error building context: %s", e)
+            return QAVerificationResult(is_correct=False, reason="Error building context")
         
-        if not results:
+        if context is None:
             return QAVerificationResult(
                 is_correct=False, 
                 reason="No chunks found for the given chunk IDs"
             )
-        
-        try:
-            context = self._build_context(results)
-        except Exception as e:
-            print(f"Error building context: {e}")
-            return QAVerificationResult(is_correct=False, reason="Error building context")
 
-        system_prompt = f"""
-        You are a helpful assistant. Your task is to verify that a comprehensive answer to a question exists in the context provided.
+        # The context comes before the question, so verifications of the same chunks share
+        # the prompt prefix and hit the Azure OpenAI prompt cache
+        system_prompt = "".join((_CHUNK_CONNECTION_PROMPT_PREFIX, context, _QUESTION_HEADER, qa.question))
         
-        If the answer to the question can be found in the context answer True otherwise return False.
-        Provide a reason for your answer. The reason should be less then 30 words.
-
-        Question: {qa.question}
-
-        # Context:
-        {context}
+        return await self._run_verification(system_prompt, "chunk_connection")
+    
+    async def _get_context_by_chunk_ids(self, chunk_ids: Iterable[str]) -> str | None:
         """
+        Get the context string for a set of chunks, memoized on the chunk IDs.
         
-        # Make the OpenAI call with manual tracing
-        with self.tracer.start_as_current_span("generator.openai.chat") as span:
-            span.set_attribute("gen_ai.prompt.0.content", system_prompt)
-
-            qa_validation_completion = self.llm_client.beta.chat.completions.parse(
-                model="gpt-4.1",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                ],
-                response_format=QAVerificationResult,
-                max_completion_tokens=800,
-                temperature=0.0,
-                frequency_penalty=0.0,
-                presence_penalty=0.0
-            )
-
-            qa_validation = qa_validation_completion.choices[0].message.parsed
-
-            span.set_attribute("gen_ai.qa.is_correct", qa_validation.is_correct)
-            span.set_attribute("gen_ai.qa.reason", qa_validation.reason)
+        Args:
+            chunk_ids (Iterable[str]): The chunk IDs to build the context from.
+        
+        Returns:
+            str | None: The context string with the chunks in the order they were cited, or None
+                if none of the chunks were found.
+        """
+        key = self._get_chunk_ids_key(chunk_ids)
+
+        # The verification checks of a Q&A run at the same time and need the same context, the
+        # first one starts the lookup and the others await it instead of searching again
+        task = self._context_tasks.get(key)
+        if task is None:
+            # A cache miss searches with the synchronous client, so the lookup runs in a worker thread
+            task = asyncio.ensure_future(asyncio.to_thread(self._records_and_context_cache, key))
+            self._context_tasks[key] = task
+            task.add_done_callback(lambda _: self._context_tasks.pop(key, None))
+
+        # Shielded, a cancelled check does not cancel the lookup the other checks are awaiting
+        records_and_context = await asyncio.shield(task)
+        return records_and_context[1]
+
+    def _get_search_records_by_chunk_ids(self, chunk_ids: Iterable[str]) -> tuple:
+        """
+        Get the search records of a set of chunks, memoized on the chunk IDs.
+        
+        Args:
+            chunk_ids (Iterable[str]): The chunk IDs to retrieve.
+        
+        Returns:
+            tuple: The search records of the chunks that were found, in the order of chunk_ids.
+                A chunk ID given more than once returns its record once, at its first position.
+        """
+        return self._records_and_context_cache(self._get_chunk_ids_key(chunk_ids))[0]
+
+    @staticmethod
+    def _get_chunk_ids_key(chunk_ids: Iterable[str]) -> tuple[str, ...]:
+        # Duplicates are dropped but the order is kept, the context lists the chunks in the
+        # order they were cited. The same chunks in another order get their own entry, their
+        # records are then served from the records kept in memory without a search
+        return tuple(dict.fromkeys(chunk_ids))
+
+    def _fetch_records_and_context(self, chunk_ids: tuple[str, ...]) -> tuple[tuple, str | None]:
+        # The chunks of a generated Q&A come from the document it was generated from, which
+        # usually is still in memory, so the search is only needed when a chunk is missing
+        records = self._get_remembered_records(chunk_ids)
+        if records is None:
+            found_records = list(self.search_service.get_search_records_by_ids(list(chunk_ids)))
+            self._remember_records(found_records)
+
+            # The search returns the records in no particular order, put them in the order of the IDs
+            get_id = self.search_service.get_search_record_id
+            records_by_id = {get_id(record): record for record in found_records}
+            records = [records_by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in records_by_id]
+
+        if not records:
+            return tuple(records), None
+        return tuple(records), self._build_context(records)
+
+    def _remember_records(self, records: list[dict]):
+        """
+        Keep search records in memory by their ID, evicting the least recently used ones.
+        
+        Args:
+            records (list[dict]): The search records to keep.
+        """
+        get_id = self.search_service.get_search_record_id
+        with self._records_by_id_lock:
+            for record in records:
+                record_id = get_id(record)
+                self._records_by_id[record_id] = record
+                self._records_by_id.move_to_end(record_id)
+            while len(self._records_by_id) > self.RECORD_CACHE_SIZE:
+                self._records_by_id.popitem(last=False)
+
+    def _get_remembered_records(self, chunk_ids: tuple[str, ...]) -> list[dict] | None:
+        """
+        Get the search records of the chunk IDs from memory.
+        
+        Args:
+            chunk_ids (tuple[str, ...]): The chunk IDs to retrieve.
+        
+        Returns:
+            list[dict] | None: The records in the order of the IDs, or None if any of them is not in memory.
+        """
+        with self._records_by_id_lock:
+            if not all(chunk_id in self._records_by_id for chunk_id in chunk_ids):
+                return None
+            for chunk_id in chunk_ids:
+                self._records_by_id.move_to_end(chunk_id)
+            return [self._records_by_id[chunk_id] for chunk_id in chunk_ids]
+
+    async def _run_verification(self, system_prompt: str, check_name: str) -> QAVerificationResult | PendingVerification:
+        """
+        Run a verification prompt against the LLM.
+        
+        Args:
+            system_prompt (str): The verification prompt including the question and context.
+            check_name (str): Name of the verification check.
+        
+        Returns:
+            QAVerificationResult | PendingVerification: The verdict and the reason given by the LLM.
+                In batch mode the prompt is queued and the result is resolved when the batch completes.
+        """
+        if self.verification_queue is not None:
+            return self.verification_queue.enqueue(system_prompt, check_name)
+
+        # The attributes go on the span of the traced check that runs this verification
+        span = trace.get_current_span()
+        span.set_attribute("gen_ai.prompt.0.content", get_prompt_attribute(system_prompt))
+
+        # Deterministic call, answered from the LLM cache when the same prompt was verified before
+        qa_validation = await cached_structured_completion(
+            self.llm_client,
+            model="gpt-4.1",
+            system_prompt=system_prompt,
+            response_format=QAVerificationResult,
+            max_completion_tokens=800,
+            temperature=0.0,
+            frequency_penalty=0.0,
+            presence_penalty=0.0
+        )
+
+        span.set_attribute("gen_ai.qa.is_correct", qa_validation.is_correct)
+        span.set_attribute("gen_ai.qa.reason", qa_validation.reason)
 
         # Console print
         if not qa_validation.is_correct:
-            print(f"Q&A validation failed: {qa_validation.reason}")
+            log.info("Q&A validation failed: %s", qa_validation.reason)
 
         return qa_validation
-    
+
+    async def _run_verifications(self, qa: QA, *checks) -> list[QAVerificationResult]:
+        """
+        Run independent verification checks at the same time.
+        
+        The checks are network bound LLM calls, so they are awaited together. Each task gets a
+        copy of the current context to keep the spans under the calling span.
+        
+        Args:
+            qa (QA): The generated Q&A object.
+            *checks: Verification coroutine methods taking the Q&A.
+        
+        Returns:
+            list[QAVerificationResult]: The results, in the order of the checks.
+        """
+        return list(await asyncio.gather(*(check(qa) for check in checks)))
+
     @traced("generator._build_context")
-    def _build_context(self, search_results) -> str:
+    def _build_context(self, search_results: list[dict]) -> str:
         """
         Build a context string from search results.
         
         Args:
-            search_results: Iterable of search results from Azure AI Search containing chunk data.
+            search_results (list[dict]): Search results from Azure AI Search containing chunk data.
         
         Returns:
             str: Formatted context string with titles and content.
         """
-        context_parts = []
+        # Handle empty results
+        if not search_results:
+            raise ValueError("No search results found. Cannot build context.")
+
+        # At most one title and one chunk part per result, filled in by index
+        context_parts = [None] * (2 * len(search_results))
+        part_count = 0
         previous_title = None
-        has_results = False
+
+        # Local names avoid repeated attribute lookups inside the loop
+        get_title = self.search_service.get_search_record_title
+        get_id = self.search_service.get_search_record_id
+        get_content = self.search_service.get_search_record_content
         
         # Process results in a single iteration
         for result in search_results:
-            has_results = True
-            
             # Get title from current result
-            current_title = self.search_service.get_search_record_title(result)
+            current_title = get_title(result)
             
-            # Add title if it's different from the previous one
-            if current_title != previous_title:
+            # Add title if it's different from the previous one (identity check first, titles usually repeat)
+            if current_title is not previous_title and current_title != previous_title:
                 if current_title:
-                    context_parts.append("Document Title: " + current_title)
+                    context_parts[part_count] = "Document Title: " + current_title
+                    part_count += 1
                 previous_title = current_title
             
             # Build chunk content and add immediately after title
-            chunk_id = self.search_service.get_search_record_id(result)
-            content = self.search_service.get_search_record_content(result)
-            context_parts.append(f"CHUNK_ID: {chunk_id}\nContent: {content}")
-        
-        # Handle empty results
-        if not has_results:
-            raise ValueError("No search results found. Cannot build context.")
+            context_parts[part_count] = "".join(("CHUNK_ID: ", str(get_id(result)), "\nContent: ", str(get_content(result))))
+            part_count += 1
         
-        return "\n\n".join(context_parts)
\ No newline at end of file
+        return "\n\n".join(context_parts[:part_count])
\ No newline at end of file
@@ -1,29 +1,62 @@
+import asyncio
+import logging
 from abc import abstractmethod
+from typing import ClassVar
 from azure.search.documents import SearchClient
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 from ..base_generator import BaseGenerator
 import diversity.diversity_generator as DiversityGenerator
-from tracing.telemetry import traced
+from llm.retry import llm_retry
+from tracing.telemetry import get_prompt_attribute, record_cached_tokens, traced
 from models import DiversityInjection, QATagged, QA, QAVerificationResult
-from search.search_service import SearchService
+
+log = logging.getLogger(__name__)
 
 class BaseSingleDocumentQAGenerator(BaseGenerator):
 
+    # Set by subclasses, the base prompt used for generating questions and answers and the
+    # tags used for categorizing them
+    BASE_PROMPT: ClassVar[str]
+    TAGS: ClassVar[dict[str, str]]
+
+    # Tool schema offered to the LLM on every generation call, built once. The SDK only
+    # serializes it, so the same tuple is passed each time
+    _TOOLS = (
+        {
+            "type": "function",
+            "function": {
+                "name": "_retry_logic",
+                "description": """
+                    If it is not possible to generate a valid Q&A according to the instructions, this tool will retry the generation process by retrieving new context.
+                    Use this tool if the context provided is not sufficient to generate a Q&A that fully meets the requirements specified in the prompt.""",
+                "parameters": {
+                    "type": "object",
+                    "properties": {},
+                    "required": [],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
+        },
+    )
+
     def __init__(
             self, 
             diversity_generator: DiversityGenerator, 
             search_client: SearchClient,
-            llm_client: AzureOpenAI,
+            llm_client: AsyncAzureOpenAI,
+            verification_mode: str = "realtime",
     ):
         super().__init__(
             diversity_generator = diversity_generator, 
             search_client = search_client, 
             llm_client = llm_client,
+            verification_mode = verification_mode,
         )
 
     @abstractmethod
     @traced("generator.verify_qa")
-    def _verify_qa(self, qa: QA) -> QAVerificationResult:
+    async def _verify_qa(self, qa: QA) -> QAVerificationResult:
         """
         Verify the generated Q&A for quality and accuracy.
         
@@ -39,33 +72,20 @@ class BaseSingleDocumentQAGenerator(BaseGenerator):
         pass
 
     @abstractmethod
-    def _get_base_prompt_generator(self) -> str:
+    def _get_verification_checks(self) -> tuple:
         """
-        Get the base prompt for this generator.
+        Get the verification checks that _verify_qa runs.
         
-        This should be implemented by subclasses to return the specific base prompt
-        used for generating questions and answers.
+        This should be implemented by subclasses to return the check methods, each taking
+        the Q&A and returning a verification result. Used by queue_verifications in batch mode.
         
         Returns:
-            str: The base prompt for this generator.
-        """
-        pass
-
-    @abstractmethod
-    def _get_tags(self) -> dict:
-        """
-        Get the tags for the generated Q&A.
-        
-        This should be implemented by subclasses to return the specific tags
-        used for categorizing the generated questions and answers.
-        
-        Returns:
-            dict: A dictionary of tags for the generated Q&A.
+            tuple: The verification check methods.
         """
         pass
 
     @traced("generator.generate")
-    def generate(self) -> QATagged:
+    async def generate(self) -> QATagged:
         """
         Generate a question-answer pair from a single document using all available chunks.
         
@@ -100,34 +120,102 @@ class BaseSingleDocumentQAGenerator(BaseGenerator):
         
         Note:
             - Uses OpenTelemetry tracing for observability and debugging
-            - Implements automatic retry logic via LLM tool calls when generation fails
-            - Subclasses must implement _verify_qa(), _get_base_prompt(), and _get_tags()
+            - Retries in a loop of at most MAX_RETRIES attempts, keeping the document unless
+              the LLM asks for new context via the retry tool
+            - Subclasses must implement _verify_qa() and set BASE_PROMPT and TAGS
             - Uses temperature=1.0 for diverse question generation
             - Validates answers against specified chunk content through subclass verification
             - Retry mechanism ensures robust generation even with challenging context
         """
 
-        random_chunk = self.search_service.get_random_chunk()
+        return await self._generate_with_retries(verify=True)
 
-        all_chunks_for_document = self.search_service.get_all_chunks_of_document(random_chunk)
+    @traced("generator.generate_unverified")
+    async def generate_unverified(self) -> QATagged:
+        """
+        Generate a question-answer pair like generate(), without verifying it.
+        
+        Used in batch verification mode, where QAFactory queues the checks with
+        queue_verifications() and keeps the Q&A pairs that pass once the batch has completed.
+        
+        Returns:
+            QATagged: The unverified Q&A object.
+        """
+        return await self._generate_with_retries(verify=False)
+
+    async def queue_verifications(self, qa: QATagged) -> list:
+        """
+        Run the verification checks of this generator on a Q&A.
+        
+        In batch mode the LLM prompts are queued on the verification queue instead of sent.
+        
+        Args:
+            qa (QATagged): The Q&A object to verify.
+        
+        Returns:
+            list: A QAVerificationResult or PendingVerification per check.
+        """
+        return await self._run_verifications(qa, *self._get_verification_checks())
 
-        all_chunks_for_document_sorted = self.search_service.sort_chunks_by_part_number(all_chunks_for_document)
+    async def _generate_with_retries(self, verify: bool) -> QATagged:
+        # The document is kept across retries, a new one is only selected when the
+        # context could not be built or the LLM finds it insufficient
+        context = None
 
-        try:
-            context = self._build_context(all_chunks_for_document_sorted)
-        except Exception as e:
-            print(f"Error building context: {e}")
-            return self._retry_logic()
+        for attempt in range(self.MAX_RETRIES + 1):
+            if attempt > 0:
+                self._retry_logic(attempt - 1)
 
-        diversity_injection = self.diversity_generator.get_diversity_injection()
+            if context is None:
+                # The search client is synchronous, so the search runs in a worker thread
+                context = await asyncio.to_thread(self._select_context)
+                if context is None:
+                    continue
 
+            diversity_injection = self.diversity_generator.get_diversity_injection()
+
+            qa = await self._generate_qa(context, diversity_injection, attempt)
+            if qa is None:
+                context = None
+                continue
+
+            # Verify the quality of the generated Q&A, retry if it is not valid
+            if verify and not (await self._verify_qa(qa)).is_correct:
+                continue
+
+            chunk_content = await asyncio.to_thread(self._get_chunk_content_by_ids, qa.chunk_ids)
+
+            qa_tagged = QATagged(
+                question=qa.question,
+                ground_truth_answer=qa.ground_truth_answer,
+                tags=self.TAGS,
+                diversity_injection=diversity_injection,
+                chunk_ids=qa.chunk_ids,
+                chunk_content=chunk_content
+            )
+                
+            return qa_tagged
+
+        # The last attempt failed as well
+        self._retry_logic(self.MAX_RETRIES)
+
+    @llm_retry
+    async def _generate_qa(self, context: str, diversity_injection: DiversityInjection, attempt: int) -> QA | None:
+        """
+        Generate a Q&A from the context with the LLM.
+        Transient LLM errors are retried with backoff, without using up one of the MAX_RETRIES attempts.
+        
+        Returns:
+            QA | None: The generated Q&A, or None if the LLM asked for new context via the retry tool.
+        """
         system_prompt = self._build_system_prompt(context=context, diversity_injection=diversity_injection)
 
         # Make the OpenAI call with manual tracing
         with self.tracer.start_as_current_span("generator.openai.chat") as span:
-            span.set_attribute("gen_ai.prompt.0.content", system_prompt)
+            span.set_attribute("gen_ai.prompt.0.content", get_prompt_attribute(system_prompt))
+            span.set_attribute("generator.attempt", attempt)
             
-            qa_completion = self.llm_client.beta.chat.completions.parse(
+            qa_completion = await self.llm_client.beta.chat.completions.parse(
                 model="gpt-4.1",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -142,12 +230,14 @@ class BaseSingleDocumentQAGenerator(BaseGenerator):
                 tools=self._get_tools()
             )
 
+            record_cached_tokens(span, qa_completion)
+
             # Execute if tool call returned
             if qa_completion.choices[0].message.tool_calls:
                 tool_call = qa_completion.choices[0].message.tool_calls[0]
                 if tool_call.function.name == "_retry_logic":
-                    print("Function call - Not possible to generate a valid Q&A according to the instructions, retrying...")
-                    return self._retry_logic()
+                    log.info("Function call - Not possible to generate a valid Q&A according to the instructions, retrying...")
+                    return None
 
             qa = qa_completion.choices[0].message.parsed
 
@@ -155,23 +245,30 @@ class BaseSingleDocumentQAGenerator(BaseGenerator):
             span.set_attribute("gen_ai.qa.question", qa.question)
             span.set_attribute("gen_ai.qa.ground_truth_answer", qa.ground_truth_answer)
 
-        # Verify the quality of the generated Q&A
-        verify_qa_result = self._verify_qa(qa)
+        return qa
+
+    @traced("generator.select_context")
+    def _select_context(self) -> str | None:
+        """
+        Select a random document and build the context from all of its chunks.
+        
+        Returns:
+            str | None: The context string, or None if it could not be built.
+        """
+        random_chunk = self.search_service.get_random_chunk()
+
+        all_chunks_for_document = self.search_service.get_all_chunks_of_document(random_chunk)
 
-        # Retry logic if the Q&A is not valid
-        if not verify_qa_result.is_correct:
-            return self._retry_logic()
+        all_chunks_for_document_sorted = list(self.search_service.sort_chunks_by_part_number(all_chunks_for_document))
 
-        qa_tagged = QATagged(
-            question=qa.question,
-            ground_truth_answer=qa.ground_truth_answer,
-            tags=self._get_tags(),
-            diversity_injection=diversity_injection,
-            chunk_ids=qa.chunk_ids,
-            chunk_content=self._get_chunk_content_by_ids(qa.chunk_ids)
-        )
-            
-        return qa_tagged
+        # The verification and chunk content lookups of the Q&A read these records again
+        self._remember_records(all_chunks_for_document_sorted)
+
+        try:
+            return self._build_context(all_chunks_for_document_sorted)
+        except Exception as e:
+            log.error("Error building context: %s", e)
+            return None
     
     @traced("generator.build_system_prompt")
     def _build_system_prompt(self, context: str, diversity_injection: DiversityInjection) -> str:
@@ -184,20 +281,18 @@ class BaseSingleDocumentQAGenerator(BaseGenerator):
         Returns:
             tuple[str, dict]: A tuple containing the complete system prompt and the diversity injection data.
         """
-        base_prompt = self._get_base_prompt_generator()
-        
-        # Format the diversity injection nicely
-        formatted_diversity = self.diversity_generator.get_injection_as_string(diversity_injection)
-
-        prompt: str = (
-            base_prompt
-            + "\n\n# Additional guidelines for the question generation:\n"
-            + "Note this instructions does not apply when generating the answer.\n"
-            + formatted_diversity
-            + "\n\n# Context:\n"
-            + context
+        # The context comes before the diversity guidelines, which change on every attempt. Retries
+        # on the same document then share the base prompt and context as prefix, which is far
+        # above the 1024 tokens needed for the Azure OpenAI prompt cache. The diversity injection
+        # caches its formatted string
+        return (
+            f"{self.BASE_PROMPT}"
+            "\n\n# Context:\n"
+            f"{context}"
+            "\n\n# Additional guidelines for the question generation:\n"
+            "Note this instructions does not apply when generating the answer.\n"
+            f"{diversity_injection.as_prompt_string}"
         )
-        return prompt
     
     def _get_chunk_content_by_ids(self, chunk_ids: list[str]) -> list[str]:
         """
@@ -207,30 +302,18 @@ class BaseSingleDocumentQAGenerator(BaseGenerator):
             chunk_ids (list[str]): List of chunk IDs to retrieve content for.
 
         Returns:
-            list[str]: List of content strings for the specified chunk IDs.
+            list[str]: List of content strings in the order of chunk_ids, so it lines up with the
+                chunk IDs of the Q&A. A chunk cited twice is repeated, chunks that were not found are left out.
         """
-        return [
-            SearchService.get_search_record_content(
-                chunk
-            ) for chunk in self.search_service.get_search_records_by_ids(chunk_ids)
-        ]
+        # The records were fetched by _verify_qa_chunk_connection and are served from the
+        # records cache, no extra search call is made. The cache returns each record once,
+        # so the content is mapped back to the IDs in the order the LLM cited them
+        get_id = self.search_service.get_search_record_id
+        get_content = self.search_service.get_search_record_content
+        content_by_id = {
+            get_id(chunk): get_content(chunk) for chunk in self._get_search_records_by_chunk_ids(chunk_ids)
+        }
+        return [content_by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in content_by_id]
     
-    def _get_tools(self):
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "_retry_logic",
-                    "description": """
-                        If it is not possible to generate a valid Q&A according to the instructions, this tool will retry the generation process by retrieving new context.
-                        Use this tool if the context provided is not sufficient to generate a Q&A that fully meets the requirements specified in the prompt.""",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {},
-                        "required": [],
-                        "additionalProperties": False
-                    },
-                    "strict": True
-                }
-            }
-        ]
\ No newline at end of file
+    def _get_tools(self) -> tuple:
+        return self._TOOLS
\ No newline at end of file
@@ -1,10 +1,13 @@
+import logging
 from azure.search.documents import SearchClient
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 import diversity.diversity_generator as DiversityGenerator
 from .base_single_document import BaseSingleDocumentQAGenerator
 from models import QAVerificationResult, QA
 from tracing.telemetry import traced
 
+log = logging.getLogger(__name__)
+
 generator_prompt ="""
 You are a Q&A‐generation assistant. You receive a single document divided into chunks (thousands of other documents exist but are not visible). 
 Your task: generate exactly one question and its answer, drawn from a single chunk you’ve been given. 
@@ -54,23 +57,46 @@ Follow these rules:
 Don’t use pronouns or references like “it” or “that clause” without explicitly naming the clause, section, or title.
 """
 
+# Static parts of the multi-hop verification prompt, only the context and question are joined in per call
+_MULTI_HOP_PROMPT_PREFIX = """
+Your role as a helpful assistant is to verify that answering the question requires drawing on information from BOTH chunks in the provided context.
+If the answer to the question REQUIRES information from BOTH chunks, return True, 
+If the answer to the question can be answered by ONE of the chunks alone, return False.
+
+is_correct: True if the question can only be answered by combining information from the two chunks, otherwise False.
+
+Provide a reason for your answer. The reason should be less then 30 words.
+
+# Context:
+"""
+
+_MULTI_HOP_QUESTION_HEADER = "\n\n# Question:\n"
+
 class MultiHopOneDocGenerator(BaseSingleDocumentQAGenerator):
+
+    BASE_PROMPT = generator_prompt
+    TAGS = {
+        "question_type": "multi_hop_same_doc",
+    }
+
     def __init__(
             self, 
             diversity_generator: DiversityGenerator, 
             search_client: SearchClient,
-            llm_client: AzureOpenAI,
+            llm_client: AsyncAzureOpenAI,
+            verification_mode: str = "realtime",
     ):
         
         super().__init__(
             diversity_generator = diversity_generator, 
             search_client = search_client, 
             llm_client = llm_client,
+            verification_mode = verification_mode,
         )
 
 
     @traced("generator.verify_qa")
-    def _verify_qa(self, qa: QA) -> QAVerificationResult:
+    async def _verify_qa(self, qa: QA) -> QAVerificationResult:
         """
         Verify that the generated Q&A is valid.
         
@@ -97,9 +123,12 @@ class MultiHopOneDocGenerator(BaseSingleDocumentQAGenerator):
             )
         """
             
-        # Check 2: Verify the answer can actually be found in the specified chunks
-        answer_has_chunk_connection = self._verify_qa_chunk_connection(qa)
+        # Check 2 and 3 are independent LLM calls, run them at the same time
+        answer_has_chunk_connection, question_requires_multi_hop = await self._run_verifications(
+            qa, *self._get_verification_checks()
+        )
 
+        # Check 2: Verify the answer can actually be found in the specified chunks
         if not answer_has_chunk_connection.is_correct:
             return QAVerificationResult(
                 is_correct=False,
@@ -107,8 +136,6 @@ class MultiHopOneDocGenerator(BaseSingleDocumentQAGenerator):
             )
 
         # Check 3: Verify that the question requires multi-hop reasoning across multiple chunks
-        question_requires_multi_hop = self._verify_qa_question_requires_multi_hop(qa)
-
         if not question_requires_multi_hop.is_correct:
             return QAVerificationResult(
                 is_correct=False,
@@ -121,7 +148,7 @@ class MultiHopOneDocGenerator(BaseSingleDocumentQAGenerator):
         )
     
     @traced("generator.verify_qa_question_requires_multi_hop")
-    def _verify_qa_question_requires_multi_hop(self, qa: QA) -> QAVerificationResult:
+    async def _verify_qa_question_requires_multi_hop(self, qa: QA) -> QAVerificationResult:
         """
         Verify that the question requires multi-hop reasoning across multiple chunks.
         
@@ -132,79 +159,25 @@ class MultiHopOneDocGenerator(BaseSingleDocumentQAGenerator):
             QAVerificationResult: True if the question requires multi-hop reasoning, False otherwise.
         """
 
-        results = self.search_service.get_search_records_by_ids(qa.chunk_ids)
-        
         try:
-            context = self._build_context(results)
+            context = await self._get_context_by_chunk_ids(qa.chunk_ids)
         except Exception as e:
-            print(f"Error building context: {e}")
+            log.error("Error building context: %s", e)
             return QAVerificationResult(is_correct=False, reason="Error building context")
 
-        system_prompt = f"""
-        Your role as a helpful assistant is to verify that answering the question requires drawing on information from BOTH chunks in the provided context.
-        If the answer to the question REQUIRES information from BOTH chunks, return True, 
-        If the answer to the question can be answered by ONE of the chunks alone, return False.
-
-        is_correct: True if the question can only be answered by combining information from the two chunks, otherwise False.
-
-        Provide a reason for your answer. The reason should be less then 30 words.
+        if context is None:
+            return QAVerificationResult(is_correct=False, reason="No chunks found for the given chunk IDs")
 
-        # Question:
-        {qa.question}
+        # Context before question, see _verify_qa_chunk_connection
+        system_prompt = "".join((_MULTI_HOP_PROMPT_PREFIX, context, _MULTI_HOP_QUESTION_HEADER, qa.question))
 
-        # Context:
-        {context}
-
-        """
-
-        # Make the OpenAI call with manual tracing
-        with self.tracer.start_as_current_span("generator.openai.chat") as span:
-            span.set_attribute("gen_ai.prompt.0.content", system_prompt)
-
-            qa_validation_completion = self.llm_client.beta.chat.completions.parse(
-                model="gpt-4.1",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                ],
-                response_format=QAVerificationResult,
-                max_completion_tokens=800,
-                temperature=0.0,
-                frequency_penalty=0.0,
-                presence_penalty=0.0
-            )
-
-            qa_validation = qa_validation_completion.choices[0].message.parsed
-
-            span.set_attribute("gen_ai.qa.is_correct", qa_validation.is_correct)
-            span.set_attribute("gen_ai.qa.reason", qa_validation.reason)
-
-        if not qa_validation.is_correct:
-            print(f"Q&A verification failed: {qa_validation.reason}")
-
-        return qa_validation
+        return await self._run_verification(system_prompt, "multi_hop")
     
-    def _get_base_prompt_generator(self) -> str:
+    def _get_verification_checks(self) -> tuple:
         """
-        Get the base prompt for this generator.
-        
-        This should be implemented by subclasses to return the specific base prompt
-        used for generating questions and answers.
-        
-        Returns:
-            str: The base prompt for this generator.
-        """
-        return generator_prompt
-    
-    def _get_tags(self) -> dict:
-        """
-        Get the tags for the generated Q&A.
-        
-        This should be implemented by subclasses to return the specific tags
-        used for categorizing the generated questions and answers.
+        Get the verification checks that _verify_qa runs.
         
         Returns:
-            dict: A dictionary of tags for the generated Q&A.
+            tuple: The verification check methods.
         """
-        return {
-            "question_type": "multi_hop_same_doc",
-        }
\ No newline at end of file
+        return (self._verify_qa_chunk_connection, self._verify_qa_question_requires_multi_hop)
@@ -1,5 +1,5 @@
 from azure.search.documents import SearchClient
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 import diversity.diversity_generator as DiversityGenerator
 from .base_single_document import BaseSingleDocumentQAGenerator
 from models import QAVerificationResult, QA
@@ -45,21 +45,29 @@ Don’t use pronouns or references like “it” or “that clause” without ex
 """
 
 class SingleHopOneDocGenerator(BaseSingleDocumentQAGenerator):
+
+    BASE_PROMPT = generator_prompt
+    TAGS = {
+        "question_type": "single_hop_same_doc",
+    }
+
     def __init__(
             self, 
             diversity_generator: DiversityGenerator, 
             search_client: SearchClient,
-            llm_client: AzureOpenAI,
+            llm_client: AsyncAzureOpenAI,
+            verification_mode: str = "realtime",
     ):
         
         super().__init__(
             diversity_generator = diversity_generator, 
             search_client = search_client, 
             llm_client = llm_client,
+            verification_mode = verification_mode,
         )
 
     @traced("generator.verify_qa")
-    def _verify_qa(self, qa: QA) -> QAVerificationResult:
+    async def _verify_qa(self, qa: QA) -> QAVerificationResult:
         """
         Verify that the generated Q&A is valid.
         
@@ -86,7 +94,8 @@ class SingleHopOneDocGenerator(BaseSingleDocumentQAGenerator):
         """
 
         # Check 2: Verify the answer can actually be found in the specified chunks
-        answer_has_chunk_connection = self._verify_qa_chunk_connection(qa)
+        # The checks are independent LLM calls and run at the same time once check 1 is restored
+        (answer_has_chunk_connection,) = await self._run_verifications(qa, *self._get_verification_checks())
 
         if not answer_has_chunk_connection.is_correct:
             return QAVerificationResult(
@@ -99,28 +108,11 @@ class SingleHopOneDocGenerator(BaseSingleDocumentQAGenerator):
             reason="All validation checks passed."
         )
 
-    def _get_base_prompt_generator(self) -> str:
+    def _get_verification_checks(self) -> tuple:
         """
-        Get the base prompt for this generator.
-        
-        This should be implemented by subclasses to return the specific base prompt
-        used for generating questions and answers.
-        
-        Returns:
-            str: The base prompt for this generator.
-        """
-        return generator_prompt
-
-    def _get_tags(self) -> dict:
-        """
-        Get the tags for the generated Q&A.
-        
-        This should be implemented by subclasses to return the specific tags
-        used for categorizing the generated questions and answers.
+        Get the verification checks that _verify_qa runs.
         
         Returns:
-            dict: A dictionary of tags for the generated Q&A.
+            tuple: The verification check methods.
         """
-        return {
-            "question_type": "single_hop_same_doc",
-        }
\ No newline at end of file
+        return (self._verify_qa_chunk_connection,)
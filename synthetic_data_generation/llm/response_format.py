@@ -0,0 +1,26 @@
+"""
+Structured output format of the Azure OpenAI calls, shared by the LLM cache and the batch verification queue.
+"""
+
+import functools
+
+
+@functools.cache
+def get_response_format(response_format) -> dict:
+    """
+    Get the strict structured output format of a pydantic model, as sent in a plain JSON request body.
+
+    Args:
+        response_format: The pydantic model the response is validated against.
+
+    Returns:
+        dict: The json_schema response format.
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": response_format.__name__,
+            "schema": {**response_format.model_json_schema(), "additionalProperties": False},
+            "strict": True
+        }
+    }
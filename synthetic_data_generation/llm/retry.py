@@ -0,0 +1,16 @@
+"""
+Retry policy for the Azure OpenAI calls of the generators and the LLM cache.
+"""
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+# Retries transient LLM errors (rate limits, timeouts, connection and 5xx errors) with exponential
+# backoff and jitter, on top of the retries of the OpenAI client, so an error under a high
+# concurrency does not lose the sample. The last error is raised when all attempts fail
+llm_retry = retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=1, max=30),
+    retry=retry_if_exception_type((RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)),
+    reraise=True
+)
@@ -1,31 +1,68 @@
-from azure.search.documents import SearchClient
-from openai import AzureOpenAI
+# Loaded before the other imports, the tracing switches (TRACE_FULL_PROMPTS, OTEL_SDK_DISABLED,
+# OTEL_TRACE_SAMPLE_RATIO, QA_TRACE_*, OTEL_BSP_*) are read from os.environ when tracing is imported
 import dotenv
 dotenv.load_dotenv()
-import os
+import asyncio
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from azure.search.documents import SearchClient
+from openai import AsyncAzureOpenAI
 from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
 from generators import SingleHopOneDocGenerator, MultiHopOneDocGenerator
 from diversity.diversity_generator import DiversityGenerator
 from models import LengthDistributionConfig
 from qa_factory.qa_factory import QAFactory
-from tracing.telemetry import setup_tracing
+from settings import Settings
+from tracing.telemetry import setup_logging, setup_tracing
+
+# Connections kept open to each service, above the concurrency so requests never wait for a connection
+HTTP_POOL_SIZE = 200
 
 if __name__ == "__main__":
 
+    # Log records are written by a background thread
+    log_listener = setup_logging()
+
+    # Read and validate the environment once
+    settings = Settings()
+
     # Initialize OpenTelemetry tracing
-    setup_tracing(enable_console=False, enable_app_insights=True)
+    setup_tracing(
+        enable_console=False,
+        enable_app_insights=True,
+        connection_string=settings.applicationinsights_connection_string
+    )
 
     index_name = "usa-expert-chatbots"
+
+    # Search calls run in worker threads, the session pool is shared by all of them
+    search_session = requests.Session()
+    search_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE))
     search_client = SearchClient(
-        endpoint=os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT"),
-    index_name=os.getenv("INDEX_NAME_OF_EXPERT_CHATBOT"),
-        credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_SERVICE_KEY"))
+        endpoint=settings.azure_search_service_endpoint,
+        index_name=settings.index_name_of_expert_chatbot,
+        credential=AzureKeyCredential(settings.azure_search_service_key),
+        transport=RequestsTransport(session=search_session, session_owner=False)
     )
 
-    llm_client = AzureOpenAI(
+    # Keep-alive HTTP/2 connections, the concurrent LLM calls are multiplexed instead of
+    # each opening a TCP and TLS connection. Limits and http2 are set on the transport, which
+    # replaces the client defaults
+    llm_http_client = httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(
+            retries=3,
+            http2=True,
+            limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE)
+        ),
+        timeout=60.0
+    )
+    llm_client = AsyncAzureOpenAI(
         api_version="2024-10-21",
-        azure_endpoint =os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_key=os.getenv("AZURE_OPENAI_API_KEY")
+        azure_endpoint=settings.azure_openai_endpoint,
+        api_key=settings.azure_openai_api_key,
+        http_client=llm_http_client
     )
 
     diversity_generator = DiversityGenerator(
@@ -53,7 +90,11 @@ if __name__ == "__main__":
             (generator_single_hop, 0.5),
             (generator_multi_hop, 0.5)
         ],
-        output_folder = "data/q-a"
+        output_folder = "data/q-a",
+        max_concurrency=10
     )
 
-    qa, path = factory.generate(6)
\ No newline at end of file
+    try:
+        qa, path = asyncio.run(factory.generate(6))
+    finally:
+        log_listener.stop()
\ No newline at end of file
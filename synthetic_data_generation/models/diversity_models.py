@@ -1,3 +1,4 @@
+from functools import cached_property
 from pydantic import BaseModel
 
 class LengthDistributionConfig(BaseModel):
@@ -9,4 +10,14 @@ class DiversityInjection(BaseModel):
     response_length: int
     tone_injection: str
     disruptive_injection: str
-    language_injection: str
\ No newline at end of file
+    language_injection: str
+
+    @cached_property
+    def as_prompt_string(self) -> str:
+        # Formatted once, the injection is not changed after it is sampled
+        return "".join((
+            "Response Length: ", str(self.response_length), "\n",
+            "Tone Injection: ", self.tone_injection, "\n",
+            "Disruptive Injection: ", self.disruptive_injection, "\n",
+            "Language Injection: ", self.language_injection, "\n"
+        ))
\ No newline at end of file
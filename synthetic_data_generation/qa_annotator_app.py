@@ -55,11 +55,11 @@ class QAAnnotatorApp:
             st.session_state.available_files = []
     
     def scan_input_directory(self):
-        """Scan input directory for JSON files"""
+        """Scan input directory for JSON and JSON Lines files"""
         try:
             json_files = []
             if self.input_dir.exists():
-                json_files = [f.name for f in self.input_dir.glob("*.json")]
+                json_files = [f.name for f in self.input_dir.iterdir() if f.suffix in (".json", ".jsonl")]
                 json_files.sort()  # Sort alphabetically
             st.session_state.available_files = json_files
             return json_files
@@ -72,7 +72,11 @@ class QAAnnotatorApp:
         try:
             file_path = self.input_dir / filename
             with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+                # The generator writes one sample per line, earlier runs a single JSON array
+                if file_path.suffix == ".jsonl":
+                    data = [json.loads(line) for line in f if line.strip()]
+                else:
+                    data = json.load(f)
             st.session_state.qa_data = data
             st.session_state.source_file = filename
             st.session_state.current_index = 0
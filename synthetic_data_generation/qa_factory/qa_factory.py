@@ -1,16 +1,54 @@
-import json
+import asyncio
+import logging
 import os
+import random
+import time
+from collections import deque
 from datetime import datetime
 from typing import List, Tuple
+import orjson
 from generators import BaseGenerator
+from models import QATagged
+from opentelemetry import trace
 from tqdm import tqdm
 from tracing.telemetry import get_tracer, traced
 
+log = logging.getLogger(__name__)
+
+
+class _RateLimiter:
+    """
+    Sliding window rate limiter, lets at most max_calls calls start in any window of window_seconds.
+    """
+
+    def __init__(self, max_calls: int, window_seconds: float = 60.0):
+        self.max_calls = max_calls
+        self.window_seconds = window_seconds
+        self._timestamps = deque()
+
+    async def acquire(self):
+        """Wait until a call may start."""
+        while True:
+            # Nothing is awaited between the check and the append, so no lock is needed
+            now = time.monotonic()
+            # Drop the calls that have left the window
+            while self._timestamps and now - self._timestamps[0] >= self.window_seconds:
+                self._timestamps.popleft()
+
+            if len(self._timestamps) < self.max_calls:
+                self._timestamps.append(now)
+                return
+
+            await asyncio.sleep(self.window_seconds - (now - self._timestamps[0]))
+
+
 class QAFactory:
     def __init__(
             self, 
             generators: List[Tuple[BaseGenerator, float]],
-            output_folder: str = "data/q-a"
+            output_folder: str = "data/q-a",
+            max_concurrency: int = 10,
+            samples_per_minute: int | None = None
             ):
         """
         Initialize QAFactory with generators and their usage percentages.
@@ -19,6 +57,10 @@ class QAFactory:
             generators: List of tuples where each tuple contains:
                 - BaseGenerator instance
                 - float representing the percentage (0.0 to 1.0) of how much this generator should be used
+            output_folder: Folder the generated Q&A file is saved to
+            max_concurrency: Number of samples generated at the same time
+            samples_per_minute: Maximum number of samples started per minute, to stay within the
+                Azure OpenAI and Azure AI Search rate limits. No limit by default
         
         Example:
             factory = QAFactory([
@@ -37,72 +79,141 @@ class QAFactory:
                 raise ValueError(f"Percentage must be between 0.0 and 1.0, got {percentage}")
         
         self.generators = generators
+        # Flat views of the generators, built once for generate()
+        self._generators = [generator for generator, _ in generators]
+        self._weights = [percentage for _, percentage in generators]
+        self._generator_names = [generator.__class__.__name__ for generator in self._generators]
         self.output_folder = output_folder
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = _RateLimiter(samples_per_minute) if samples_per_minute else None
         self.tracer = get_tracer("qa-factory")
 
     @traced("qa_factory.generate_samples")
-    def generate(self, number_of_samples: int) -> Tuple[List[dict], str]:
+    async def generate(self, number_of_samples: int) -> Tuple[List[QATagged], str]:
         """
         Generate a list of Q&A samples based on the configured generators and their usage percentages.
         
+        Generators in batch verification mode first generate all their samples unverified. Their
+        verifications run as Azure OpenAI batch jobs, and samples failing a check are dropped
+        instead of regenerated.
+        
+        Samples are appended to a JSON Lines file as soon as they are final, so the samples
+        generated before an interruption are kept.
+        
         Args:
             number_of_samples: Total number of Q&A samples to generate
             
         Returns:
-            Tuple[List[dict], str]: Tuple containing list of generated Q&A samples and the file path
+            Tuple[List[QATagged], str]: Tuple containing list of generated Q&A samples and the file path
         """
-        samples = []
-        
-        # Create a single progress bar for all samples
-        with tqdm(total=number_of_samples, desc="Generating Q&A samples", unit="samples") as pbar:
-            for i, (generator, percentage) in enumerate(self.generators):
-                # Calculate how many samples this generator should produce
-                num_samples_for_generator = int(number_of_samples * percentage)
-                
-                if num_samples_for_generator == 0:
+        # Each sample is assigned to a generator with the percentages as weights, so exactly
+        # number_of_samples samples are generated and the generators run at the same time
+        assignments = random.choices(self._generators, weights=self._weights, k=number_of_samples)
+
+        span = trace.get_current_span()
+        for generator, percentage, generator_name in zip(self._generators, self._weights, self._generator_names):
+            span.set_attribute(f"generator.{generator_name}.samples_to_generate", assignments.count(generator))
+            span.set_attribute(f"generator.{generator_name}.percentage", percentage)
+
+        # Shared by all generators, at most max_concurrency samples are generated at the same time
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        full_path = self._get_output_path()
+
+        with open(full_path, 'wb') as output_file:
+            # Create a single progress bar for all samples
+            with tqdm(total=number_of_samples, desc="Generating Q&A samples", unit="samples") as pbar:
+                generated = await self._run_concurrently(assignments, semaphore, pbar, output_file)
+
+            samples = [sample for generator, sample in generated if generator.verification_mode != "batch"]
+
+            # Batch mode generators only generated candidates, their verification prompts go to one
+            # batch job per generator. All jobs are submitted before the first one is awaited
+            pending_batches = []
+            for generator in self._generators:
+                if generator.verification_mode != "batch":
                     continue
-                
-                # Create a span for each generator's batch to ensure proper nesting
-                with self.tracer.start_as_current_span(f"qa_factory.generator_{generator.__class__.__name__}") as generator_span:
-                    generator_span.set_attribute("generator.class", generator.__class__.__name__)
-                    generator_span.set_attribute("generator.samples_to_generate", num_samples_for_generator)
-                    generator_span.set_attribute("generator.percentage", percentage)
-                    
-                    # Generate the required number of samples from this generator
-                    for sample_idx in range(num_samples_for_generator):
-                        sample = generator.generate()
-                        samples.append(sample)
-                        pbar.update(1)  # Update the progress bar
-        
-        full_path = self.save_qa_to_json(samples)
+                candidates = [sample for sample_generator, sample in generated if sample_generator is generator]
+                verifications = await asyncio.gather(*(generator.queue_verifications(qa) for qa in candidates))
+                await generator.verification_queue.submit()
+                pending_batches.append((generator, candidates, verifications))
 
-        print(f"✓ Successfully generated {len(samples)} total Q&A samples")
+            for generator, candidates, verifications in pending_batches:
+                verified_samples = await self._collect_verified_samples(generator, candidates, verifications)
+                for sample in verified_samples:
+                    self._write_sample(output_file, sample)
+                samples.extend(verified_samples)
+
+        log.info("✓ Saved %d Q&A samples to %s", len(samples), full_path)
+        log.info("✓ Successfully generated %d total Q&A samples", len(samples))
         return samples, full_path
 
-    def save_qa_to_json(self, qa_samples: List[any]):
+    async def _run_concurrently(self, assignments: list, semaphore: asyncio.Semaphore, pbar: tqdm, output_file) -> list:
         """
-        Save the generated Q&A samples to a JSON file.
+        Generate one sample per assigned generator, bounded by the semaphore.
         
-        Args:
-            qa_samples: List of Q&A samples to save (QATagged objects)
+        Samples are dominated by LLM and search latency, so they are generated concurrently on
+        the event loop. Each task gets a copy of the current context to keep the spans under
+        the factory span. Verified samples are written to the output file as they complete.
+        
+        Returns:
+            list: (generator, sample) tuples in order of completion.
         """
+        generated = []
+        tasks = [asyncio.ensure_future(self._generate_sample(generator, semaphore)) for generator in assignments]
+        for task in asyncio.as_completed(tasks):
+            generator, sample = await task
+            if generator.verification_mode != "batch":
+                self._write_sample(output_file, sample)
+            generated.append((generator, sample))
+            pbar.update(1)  # Update the progress bar
+        return generated
+
+    async def _generate_sample(self, generator: BaseGenerator, semaphore: asyncio.Semaphore):
+        # Batch mode generators are verified afterwards with the batch job
+        generate = generator.generate_unverified if generator.verification_mode == "batch" else generator.generate
+        async with semaphore:
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            return generator, await generate()
 
+    async def _collect_verified_samples(self, generator: BaseGenerator, candidates: list, verifications: list) -> list:
+        """Wait for a generator's batch job and keep the samples that passed every check."""
+        await generator.verification_queue.collect()
+
+        verified_samples = []
+        for qa, results in zip(candidates, verifications):
+            failed = next((result for result in results if not result.is_correct), None)
+            if failed is not None:
+                log.info("Q&A validation failed: %s", failed.reason)
+                continue
+            verified_samples.append(qa)
+
+        log.info(
+            "✓ %d/%d %s samples passed batch verification",
+            len(verified_samples), len(candidates), generator.__class__.__name__
+        )
+        return verified_samples
+
+    def _get_output_path(self) -> str:
+        """
+        Get the path of a new timestamped JSON Lines output file, creating the output folder.
+        
+        Returns:
+            str: The path of the output file.
+        """
         # Generate timestamp for filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"qa_generated_{timestamp}.json"
-
-        # Combine output_folder (folder) with generated filename
-        full_path = os.path.join(self.output_folder, filename)
+        filename = f"qa_generated_{timestamp}.jsonl"
 
         # Ensure the directory exists
         os.makedirs(self.output_folder, exist_ok=True)
 
-        # Convert QATagged objects to dictionaries for JSON serialization
-        serializable_samples = [sample.model_dump() for sample in qa_samples]
-
-        with open(full_path, 'w', encoding='utf-8') as f:
-            json.dump(serializable_samples, f, indent=2, ensure_ascii=False)
-
-        print(f"✓ Saved {len(qa_samples)} Q&A samples to {full_path}")
+        # Combine output_folder (folder) with generated filename
+        return os.path.join(self.output_folder, filename)
 
-        return full_path
\ No newline at end of file
+    @staticmethod
+    def _write_sample(output_file, sample):
+        # One sample per line, flushed so a crash does not lose the samples written so far
+        output_file.write(orjson.dumps(sample.model_dump(), option=orjson.OPT_APPEND_NEWLINE))
+        output_file.flush()
@@ -72,11 +72,16 @@ class SearchService:
         """
         Get chunks/documents from the search index by their IDs.
         
+        Implementations should fetch all IDs with a single search request (e.g. a search.in
+        filter) and return the same fields as get_all_chunks_of_document, the generators keep
+        both kinds of records in one cache by ID.
+        
         Args:
             search_record_ids (list[str]): List of chunk IDs to retrieve
             
         Returns:
-            Iterable[Any]: Iterable of search results containing the specified chunks
+            Iterable[Any]: Iterable of search results containing the specified chunks, in any order.
+                IDs that are not in the index are skipped.
         """
         pass
 
@@ -0,0 +1,23 @@
+"""
+Environment configuration of the Q&A generation.
+The variables are read from the environment and the .env file once, and validated at startup,
+so a missing variable fails immediately instead of on the first search or LLM call.
+The tracing switches are not part of Settings, main.py loads the .env file into os.environ
+before tracing.telemetry reads them.
+"""
+
+from dotenv import find_dotenv
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    # Field names match the environment variables, case-insensitively
+    azure_search_service_endpoint: str
+    azure_search_service_key: str
+    index_name_of_expert_chatbot: str
+    azure_openai_endpoint: str
+    azure_openai_api_key: str
+    applicationinsights_connection_string: str | None = None
+
+    # Same .env lookup as dotenv.load_dotenv(), searching upwards from this directory
+    model_config = SettingsConfigDict(env_file=find_dotenv(), extra="ignore")
@@ -0,0 +1,70 @@
+"""
+Span exporter that runs the exports of another exporter on a pool of worker threads.
+A BatchSpanProcessor exports one batch at a time from its single worker thread, so with a remote
+exporter each batch waits for the previous HTTP request. Wrapped in this exporter, up to
+num_workers batches are sent at the same time.
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Sequence
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+log = logging.getLogger(__name__)
+
+
+class ConcurrentSpanExporter(SpanExporter):
+    """
+    Hands each batch to a worker thread and returns without waiting for the export.
+
+    Usage:
+        BatchSpanProcessor(ConcurrentSpanExporter(AzureMonitorTraceExporter(...), num_workers=4))
+    """
+
+    def __init__(self, exporter: SpanExporter, num_workers: int = 4):
+        """
+        Args:
+            exporter: The exporter that sends the spans, called from several threads at once.
+            num_workers: Number of batches exported at the same time.
+        """
+        self.exporter = exporter
+        self._executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="span-export")
+        # Bounds the batches in flight, the processor waits for a free worker instead of
+        # queueing batches in the executor without limit
+        self._slots = threading.BoundedSemaphore(num_workers)
+        self._in_flight: set[Future] = set()
+        self._in_flight_lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        self._slots.acquire()
+        # Copied, the batch is exported after this call has returned
+        future = self._executor.submit(self.exporter.export, list(spans))
+        with self._in_flight_lock:
+            self._in_flight.add(future)
+        future.add_done_callback(self._on_export_done)
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        with self._in_flight_lock:
+            in_flight = list(self._in_flight)
+        _, not_done = wait(in_flight, timeout=timeout_millis / 1000)
+        return not not_done and self.exporter.force_flush(timeout_millis)
+
+    def shutdown(self):
+        # Waits for the exports in flight before the exporter is shut down
+        self._executor.shutdown(wait=True)
+        self.exporter.shutdown()
+
+    def _on_export_done(self, future: Future):
+        with self._in_flight_lock:
+            self._in_flight.discard(future)
+        self._slots.release()
+
+        # The processor already got SUCCESS, failures are only logged
+        error = future.exception()
+        if error is not None:
+            log.warning("⚠️  Span export failed: %s", error)
+        elif future.result() != SpanExportResult.SUCCESS:
+            log.warning("⚠️  Span export failed: %s", future.result().name)
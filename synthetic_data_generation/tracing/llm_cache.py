@@ -0,0 +1,111 @@
+"""
+Content-addressed cache for deterministic LLM calls.
+Verification prompts run with temperature 0.0, so the same prompt gives the same answer.
+Results are kept in memory and on disk, and reused when a retry sends the same prompt again.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import diskcache
+from opentelemetry import trace
+from openai import AsyncAzureOpenAI
+from llm.response_format import get_response_format
+from llm.retry import llm_retry
+from tracing.telemetry import record_cached_tokens
+
+LLM_CACHE_DIRECTORY = ".llm_cache"
+MEMORY_CACHE_SIZE = 4096
+
+_memory_cache = OrderedDict()
+_memory_cache_lock = threading.Lock()
+_disk_cache = None
+_disk_cache_lock = threading.Lock()
+
+
+async def cached_structured_completion(client: AsyncAzureOpenAI, model: str, system_prompt: str, response_format, **kwargs):
+    """
+    Get a chat completion constrained to the JSON schema of response_format, or return the cached result.
+    Only use this for deterministic calls (temperature 0.0).
+
+    The request is a plain client.chat.completions.create call with a single system message and a
+    strict json_schema response format. The response is validated once with model_validate_json.
+    Memory cache hits are served on the event loop, the disk cache is read and written in a
+    worker thread.
+
+    Args:
+        client: The OpenAI client used on a cache miss.
+        model: The model deployment name.
+        system_prompt: The system prompt.
+        response_format: The pydantic model the response is parsed into.
+        **kwargs: Remaining completion parameters (temperature, max_completion_tokens, ...).
+
+    Returns:
+        The parsed response, an instance of response_format.
+    """
+    key = _get_key(model, system_prompt, response_format, kwargs)
+
+    parsed = _get_from_memory(key)
+    if parsed is not None:
+        return parsed
+
+    disk_cache = _get_disk_cache()
+    parsed = await asyncio.to_thread(disk_cache.get, key)
+    if parsed is None:
+        completion = await _create_completion(
+            client,
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+            ],
+            response_format=get_response_format(response_format),
+            **kwargs
+        )
+        record_cached_tokens(trace.get_current_span(), completion)
+        parsed = response_format.model_validate_json(completion.choices[0].message.content)
+        await asyncio.to_thread(disk_cache.set, key, parsed)
+
+    _add_to_memory(key, parsed)
+    return parsed
+
+
+@llm_retry
+async def _create_completion(client: AsyncAzureOpenAI, **kwargs):
+    return await client.chat.completions.create(**kwargs)
+
+
+def _get_key(model: str, system_prompt: str, response_format, kwargs: dict) -> str:
+    content = "\x1f".join((
+        model,
+        system_prompt,
+        response_format.__name__,
+        json.dumps(kwargs, sort_keys=True, default=str)
+    ))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _get_from_memory(key: str):
+    with _memory_cache_lock:
+        parsed = _memory_cache.get(key)
+        if parsed is not None:
+            _memory_cache.move_to_end(key)
+        return parsed
+
+
+def _add_to_memory(key: str, parsed):
+    with _memory_cache_lock:
+        _memory_cache[key] = parsed
+        _memory_cache.move_to_end(key)
+        if len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _get_disk_cache() -> diskcache.Cache:
+    # Opened on first use, so importing this module does not create the cache directory
+    global _disk_cache
+    with _disk_cache_lock:
+        if _disk_cache is None:
+            _disk_cache = diskcache.Cache(LLM_CACHE_DIRECTORY)
+        return _disk_cache
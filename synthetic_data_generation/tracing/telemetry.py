@@ -6,66 +6,216 @@ Supports both console output and Azure Application Insights.
 
 import os
 import functools
+import inspect
+import logging
+import queue
+import types
+from collections.abc import AsyncIterator, Iterator
+from logging.handlers import QueueHandler, QueueListener
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.instrumentation.openai import OpenAIInstrumentor
 from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
 from opentelemetry.sdk.resources import Resource
+from tracing.concurrent_exporter import ConcurrentSpanExporter
 
-def setup_tracing(enable_console: bool = True, enable_app_insights: bool = True):
+# Prompts are truncated on spans to bound the telemetry payload, set TRACE_FULL_PROMPTS=1 in the
+# process environment to record them in full
+TRACE_FULL_PROMPTS = os.getenv("TRACE_FULL_PROMPTS") == "1"
+PROMPT_ATTRIBUTE_LENGTH = 512
+
+# Standard OpenTelemetry switch, the SDK then hands out no-op tracers and traced leaves functions unwrapped
+TRACING_DISABLED = os.getenv("OTEL_SDK_DISABLED", "").lower() == "true"
+
+# Tracers by name, shared by all callers of get_tracer
+_tracers = {}
+
+# Results whose length is not recorded
+_LAZY_RESULT_TYPES = (types.GeneratorType, types.AsyncGeneratorType, Iterator, AsyncIterator)
+
+# Batch span processor settings tuned for bursts of LLM calls: a larger queue so spans are not
+# dropped, and smaller, more frequent exports. The OTEL_BSP_* environment variables override them
+BSP_MAX_QUEUE_SIZE = 4096
+BSP_SCHEDULE_DELAY_MILLIS = 1000
+BSP_MAX_EXPORT_BATCH_SIZE = 256
+BSP_EXPORT_TIMEOUT_MILLIS = 10000
+
+# Batches sent to Application Insights at the same time
+AZURE_EXPORT_WORKERS = 4
+
+# The console exporter writes to stdout synchronously, fewer and larger flushes keep the cost down
+CONSOLE_BSP_MAX_EXPORT_BATCH_SIZE = 64
+CONSOLE_BSP_SCHEDULE_DELAY_MILLIS = 2000
+
+log = logging.getLogger(__name__)
+
+def setup_logging(level: int = logging.INFO) -> QueueListener:
+    """
+    Configure logging through a queue drained by one background thread.
+    The concurrent generation tasks and search threads only enqueue their records, the
+    listener thread does the formatting and the writes to stderr.
+    
+    Args:
+        level: Log level of the root logger (default: INFO)
+    
+    Returns:
+        QueueListener: The started listener, stop it before exiting to flush the remaining records.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # The queue handler only merges the arguments into the message, the listener's handler formats the line
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=level, handlers=[queue_handler])
+
+    # The Azure SDK and httpx log every request at INFO
+    logging.getLogger("azure").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+def setup_tracing(
+        enable_console: bool = False,
+        enable_app_insights: bool = True,
+        connection_string: str | None = None,
+        bsp_max_queue_size: int | None = None,
+        bsp_schedule_delay_millis: int | None = None,
+        bsp_max_export_batch_size: int | None = None,
+        bsp_export_timeout_millis: int | None = None,
+        sample_ratio: float | None = None
+):
     """
     Initialize OpenTelemetry tracing with OpenAI auto-instrumentation.
     This will automatically trace all OpenAI API calls with generative AI semantic conventions.
     
     Args:
-        enable_console: Whether to output traces to console (default: True)
+        enable_console: Whether to output traces to console, also enabled by QA_TRACE_CONSOLE=1 (default: False)
         enable_app_insights: Whether to send traces to Application Insights (default: True)
+        connection_string: Application Insights connection string. Read from the
+            APPLICATIONINSIGHTS_CONNECTION_STRING environment variable if not given
+        bsp_max_queue_size: Spans buffered before new spans are dropped
+            (default: OTEL_BSP_MAX_QUEUE_SIZE or BSP_MAX_QUEUE_SIZE)
+        bsp_schedule_delay_millis: Delay between two exports
+            (default: OTEL_BSP_SCHEDULE_DELAY or BSP_SCHEDULE_DELAY_MILLIS)
+        bsp_max_export_batch_size: Spans sent per export
+            (default: OTEL_BSP_MAX_EXPORT_BATCH_SIZE or BSP_MAX_EXPORT_BATCH_SIZE)
+        bsp_export_timeout_millis: Time an export may take before it is cancelled
+            (default: OTEL_BSP_EXPORT_TIMEOUT or BSP_EXPORT_TIMEOUT_MILLIS)
+        sample_ratio: Share of traces recorded, between 0.0 and 1.0. Child spans follow the decision
+            of their parent, so a QAFactory run is recorded as a whole or not at all
+            (default: OTEL_TRACE_SAMPLE_RATIO or 1.0)
     """
+    # Shared by the processors, the console processor exports in smaller batches less often
+    processor_settings = {
+        "max_queue_size": _get_bsp_setting(bsp_max_queue_size, "OTEL_BSP_MAX_QUEUE_SIZE", BSP_MAX_QUEUE_SIZE),
+        "schedule_delay_millis": _get_bsp_setting(bsp_schedule_delay_millis, "OTEL_BSP_SCHEDULE_DELAY", BSP_SCHEDULE_DELAY_MILLIS),
+        "max_export_batch_size": _get_bsp_setting(bsp_max_export_batch_size, "OTEL_BSP_MAX_EXPORT_BATCH_SIZE", BSP_MAX_EXPORT_BATCH_SIZE),
+        "export_timeout_millis": _get_bsp_setting(bsp_export_timeout_millis, "OTEL_BSP_EXPORT_TIMEOUT", BSP_EXPORT_TIMEOUT_MILLIS),
+    }
     
+    # A tracer provider can only be set once, on a rerun (e.g. in a notebook) the existing
+    # setup is kept instead of adding a second set of exporters and instrumentation
+    if isinstance(trace.get_tracer_provider(), TracerProvider):
+        log.info("✓ OpenTelemetry tracing already initialized")
+        return
+
+    # Status lines, logged together at the end
+    status = []
+
     # Set up the tracer provider with service name
     resource = Resource.create({
         "service.name": "qa-generator",
         "service.version": "1.0.0",
     })
     
-    trace.set_tracer_provider(TracerProvider(resource=resource))
+    if sample_ratio is None:
+        sample_ratio = float(os.getenv("OTEL_TRACE_SAMPLE_RATIO", "1.0"))
+    sampler = ParentBased(TraceIdRatioBased(sample_ratio))
+
+    trace.set_tracer_provider(TracerProvider(resource=resource, sampler=sampler))
     tracer_provider = trace.get_tracer_provider()
     
     # Set up console exporter if enabled
-    if enable_console:
+    if enable_console or os.getenv("QA_TRACE_CONSOLE") == "1":
         console_exporter = ConsoleSpanExporter()
-        console_processor = BatchSpanProcessor(console_exporter)
+        console_processor = BatchSpanProcessor(
+            console_exporter,
+            **{
+                **processor_settings,
+                "max_export_batch_size": CONSOLE_BSP_MAX_EXPORT_BATCH_SIZE,
+                "schedule_delay_millis": CONSOLE_BSP_SCHEDULE_DELAY_MILLIS,
+            }
+        )
         tracer_provider.add_span_processor(console_processor)
-        print("✓ Console trace output enabled")
+        status.append("✓ Console trace output enabled")
     
     # Set up Azure Application Insights exporter if enabled and configured
     if enable_app_insights:
-        connection_string = os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
+        connection_string = connection_string or os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
         if connection_string:
             try:
                 azure_exporter = AzureMonitorTraceExporter(
                     connection_string=connection_string
                 )
-                azure_processor = BatchSpanProcessor(azure_exporter)
+                # Remote ingestion, several batches are exported at the same time
+                azure_processor = BatchSpanProcessor(
+                    ConcurrentSpanExporter(azure_exporter, num_workers=AZURE_EXPORT_WORKERS),
+                    **processor_settings
+                )
                 tracer_provider.add_span_processor(azure_processor)
-                print("✓ Azure Application Insights tracing enabled")
-                print(f"✓ Connection string configured: {connection_string[:50]}...")
+                status.append("✓ Azure Application Insights tracing enabled")
+                status.append(f"✓ Connection string configured: {connection_string[:50]}...")
             except Exception as e:
-                print(f"⚠️  Failed to set up Application Insights: {e}")
-                print("   Continuing with console output only...")
+                log.warning("⚠️  Failed to set up Application Insights: %s. Continuing with console output only...", e)
         else:
-            print("⚠️  APPLICATIONINSIGHTS_CONNECTION_STRING not found in environment")
-            print("   Set this environment variable to enable Application Insights tracing")
-            print("   Continuing with console output only...")
+            log.warning(
+                "⚠️  APPLICATIONINSIGHTS_CONNECTION_STRING not found in environment. "
+                "Set this environment variable to enable Application Insights tracing. "
+                "Continuing with console output only..."
+            )
     
     # Auto-instrument OpenAI SDK - this will automatically trace all OpenAI calls
     # with generative AI semantic conventions
     # .parsed() is not supported in the latest OpenAIInstrumentor. Tracing is implemented manually for those cases
-    OpenAIInstrumentor().instrument()
+    instrumentor = OpenAIInstrumentor()
+    if not instrumentor.is_instrumented_by_opentelemetry:
+        instrumentor.instrument()
     
-    print("✓ OpenTelemetry tracing initialized with OpenAI auto-instrumentation")
-    print("✓ Service name set to: qa-generator")
+    status.append("✓ OpenTelemetry tracing initialized with OpenAI auto-instrumentation")
+    status.append("✓ Service name set to: qa-generator")
+
+    # One record instead of one per line, shown at INFO with QA_TRACE_VERBOSE=1. Warnings are always logged
+    log.log(logging.INFO if os.getenv("QA_TRACE_VERBOSE") == "1" else logging.DEBUG, "\n".join(status))
+
+def _get_argument_attribute(value, limit: int = 100):
+    """
+    Get the span attribute value of a function argument without formatting large values in full.
+    Scalars are recorded as they are, strings are truncated to limit characters and containers
+    are summarized by their type and length.
+    """
+    if isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= limit else value[:limit - 3] + "..."
+    if isinstance(value, (list, tuple, set, frozenset, dict)):
+        return f"<{type(value).__name__} len={len(value)}>"
+
+    # Other objects are formatted, truncated if too long
+    str_value = str(value)
+    if len(str_value) > limit:
+        str_value = str_value[:limit - 3] + "..."
+    return str_value
+
+def _get_bsp_setting(value: int | None, env_var: str, default: int) -> int:
+    if value is not None:
+        return value
+    return int(os.getenv(env_var, default))
 
 def get_tracer(name: str = "qa-generator"):
     """
@@ -77,75 +227,197 @@ def get_tracer(name: str = "qa-generator"):
     Returns:
         OpenTelemetry tracer instance
     """
-    return trace.get_tracer(name)
+    # The provider builds a new tracer on every call, each name is resolved once. A proxy tracer
+    # returned before setup_tracing forwards to the provider set later
+    tracer = _tracers.get(name)
+    if tracer is None:
+        tracer = _tracers.setdefault(name, trace.get_tracer(name))
+    return tracer
+
+def get_prompt_attribute(prompt: str) -> str:
+    """
+    Get the prompt as it is recorded on a span.
+    
+    Args:
+        prompt: The full prompt.
+    
+    Returns:
+        The prompt, truncated to PROMPT_ATTRIBUTE_LENGTH characters unless TRACE_FULL_PROMPTS=1.
+    """
+    if TRACE_FULL_PROMPTS:
+        return prompt
+    return prompt[:PROMPT_ATTRIBUTE_LENGTH]
 
-def traced(span_name: str = None, record_args: bool = True, record_result: bool = True):
+def record_cached_tokens(span, completion):
+    """
+    Record how many prompt tokens were served from the Azure OpenAI prompt cache.
+    Prompts share the cache when their first 1024 tokens or more are identical.
+    
+    Args:
+        span: The span to set the attribute on.
+        completion: The chat completion returned by the OpenAI client.
+    """
+    details = getattr(completion.usage, "prompt_tokens_details", None)
+    if details is not None and details.cached_tokens is not None:
+        span.set_attribute("gen_ai.usage.cache_read.input_tokens", details.cached_tokens)
+
+def traced(
+        span_name: str = None,
+        record_args: bool = True,
+        record_result: bool = True,
+        record_exceptions: bool = True,
+        skip_exception_types: tuple[type[BaseException], ...] = ()
+):
     """
     Simple decorator to automatically trace method calls.
+    Works on both regular functions and coroutine functions. Returns the function unchanged
+    when OTEL_SDK_DISABLED=true.
     
     Args:
         span_name: Optional custom span name. If not provided, uses method name.
         record_args: Whether to record function arguments as attributes
         record_result: Whether to record return value attributes
+        record_exceptions: Whether to record exceptions with their traceback as span events.
+            The error attributes are always set
+        skip_exception_types: Exceptions recorded without traceback, e.g. retried rate limit errors
     """
     def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            # Get the tracer - try from instance first, then default
-            if args and hasattr(args[0], 'tracer'):
-                tracer = args[0].tracer
-            else:
+        # No wrapper at all when tracing is disabled
+        if TRACING_DISABLED:
+            return func
+
+        # Parameter names and defaults read once per decorated function, the arguments are then
+        # matched to them directly instead of binding the signature on every call
+        if record_args:
+            parameters = inspect.signature(func).parameters
+            positional_names = tuple(
+                name for name, parameter in parameters.items()
+                if parameter.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+            )
+            defaults = {
+                name: parameter.default for name, parameter in parameters.items()
+                if parameter.default is not inspect.Parameter.empty
+            }
+
+        # Methods are defined in a class body, their qualified name has no "<locals>" before the name
+        qualified_scope, _, _ = func.__qualname__.rpartition('.')
+        is_method = bool(qualified_scope) and not qualified_scope.endswith('<locals>')
+        # Auto-generated span names of methods, one per instance class
+        method_span_names = {}
+
+        def start_span(args, kwargs):
+            # Get the tracer - try from instance first, then default. Free functions have no
+            # instance, their first argument is not looked at
+            tracer = getattr(args[0], 'tracer', None) if is_method and args else None
+            if tracer is None:
                 tracer = get_tracer()
             
-            # Determine span name
-            if span_name:
-                final_span_name = span_name
-            else:
-                # Auto-generate from class and method
-                if args and hasattr(args[0], '__class__'):
-                    class_name = args[0].__class__.__name__.lower()
-                    method_name = func.__name__
-                    final_span_name = f"{class_name}.{method_name}"
-                else:
-                    final_span_name = func.__name__
+            # Exceptions are recorded by record_failure, not a second time by the span
+            return tracer.start_as_current_span(span_name or get_span_name(args), record_exception=False)
+
+        def get_span_name(args):
+            if not (is_method and args):
+                return func.__name__
+
+            # Auto-generate from class and method, subclasses get their own name
+            instance_class = args[0].__class__
+            final_span_name = method_span_names.get(instance_class)
+            if final_span_name is None:
+                final_span_name = f"{instance_class.__name__.lower()}.{func.__name__}"
+                method_span_names[instance_class] = final_span_name
+            return final_span_name
+
+        def record_arguments(span, args, kwargs):
+            # Record arguments if requested, collected first and set on the span in one call
+            if record_args:
+                attributes = {}
+                for param_name, value in zip(positional_names, args):
+                    add_argument(attributes, param_name, value)
+                for param_name, value in kwargs.items():
+                    add_argument(attributes, param_name, value)
+
+                # Arguments left at their default
+                passed_positionally = positional_names[:len(args)]
+                for param_name, value in defaults.items():
+                    if param_name not in kwargs and param_name not in passed_positionally:
+                        add_argument(attributes, param_name, value)
+
+                span.set_attributes(attributes)
+
+        def add_argument(attributes, param_name, value):
+            if param_name != 'self':  # Skip self parameter
+                attributes[f"function.arg.{param_name}"] = _get_argument_attribute(value)
+
+        def record_success(span, result):
+            attributes = {"function.success": True}
+
+            # Record result if requested
+            if record_result:
+                result_type = type(result)
+                attributes["function.result.type"] = result_type.__name__
+                # Generators and iterators are not touched, they would be consumed
+                if not isinstance(result, _LAZY_RESULT_TYPES):
+                    get_length = getattr(result_type, '__len__', None)
+                    if get_length is not None:
+                        try:
+                            attributes["function.result.length"] = get_length(result)
+                        except Exception:
+                            pass
             
+            span.set_attributes(attributes)
+
+        def record_failure(span, e):
+            # Record exception details
+            span.set_attributes({
+                "function.success": False,
+                "error.type": type(e).__name__,
+                "error.message": str(e),
+            })
+            # Formatting the traceback is the costly part, skipped for expected exceptions
+            if record_exceptions and not isinstance(e, skip_exception_types):
+                span.record_exception(e)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                # Execute with tracing, the span stays current while the coroutine is awaited
+                with start_span(args, kwargs) as span:
+                    # Sampled out or tracing disabled, nothing to record
+                    recording = span.is_recording()
+                    try:
+                        if recording:
+                            record_arguments(span, args, kwargs)
+                        result = await func(*args, **kwargs)
+                        if recording:
+                            record_success(span, result)
+                        return result
+                    except Exception as e:
+                        if recording:
+                            record_failure(span, e)
+                        raise
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
             # Execute with tracing
-            with tracer.start_as_current_span(final_span_name) as span:
+            with start_span(args, kwargs) as span:
+                # Sampled out or tracing disabled, nothing to record
+                recording = span.is_recording()
                 try:
-                    # Record arguments if requested
-                    if record_args:
-                        # Get function signature for parameter names
-                        import inspect
-                        sig = inspect.signature(func)
-                        bound_args = sig.bind(*args, **kwargs)
-                        bound_args.apply_defaults()
-                        
-                        for param_name, value in bound_args.arguments.items():
-                            if param_name != 'self':  # Skip self parameter
-                                # Convert to string and truncate if too long
-                                str_value = str(value)
-                                if len(str_value) > 100:
-                                    str_value = str_value[:97] + "..."
-                                span.set_attribute(f"function.arg.{param_name}", str_value)
+                    if recording:
+                        record_arguments(span, args, kwargs)
                     
                     # Execute the function
                     result = func(*args, **kwargs)
                     
-                    # Record result if requested
-                    if record_result:
-                        if hasattr(result, '__len__'):
-                            span.set_attribute("function.result.length", len(result))
-                        span.set_attribute("function.result.type", type(result).__name__)
-                    
-                    span.set_attribute("function.success", True)
+                    if recording:
+                        record_success(span, result)
                     return result
                     
                 except Exception as e:
-                    # Record exception details
-                    span.set_attribute("function.success", False)
-                    span.set_attribute("error.type", type(e).__name__)
-                    span.set_attribute("error.message", str(e))
-                    span.record_exception(e)
+                    if recording:
+                        record_failure(span, e)
                     raise
         
         return wrapper
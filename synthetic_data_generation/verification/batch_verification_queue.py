@@ -0,0 +1,195 @@
+"""
+Deferred Q&A verification through the Azure OpenAI Batch API.
+Verification prompts are buffered while the Q&A pairs are generated, sent as one batch job and
+resolved when the job has completed. Batch jobs cost less and have a higher throughput than
+real-time calls, at the price of a completion window of up to 24 hours.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import uuid
+from openai import AsyncAzureOpenAI
+from pydantic import ValidationError
+from models import QAVerificationResult
+from llm.response_format import get_response_format
+
+BATCH_ENDPOINT = "/chat/completions"
+COMPLETION_WINDOW = "24h"
+TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+log = logging.getLogger(__name__)
+
+
+class PendingVerification:
+    """
+    Verification result that is filled in once the batch job has completed.
+    Exposes the same is_correct and reason attributes as QAVerificationResult.
+    """
+
+    def __init__(self, custom_id: str, check_name: str):
+        self.custom_id = custom_id
+        self.check_name = check_name
+        self.result: QAVerificationResult | None = None
+
+    @property
+    def is_correct(self) -> bool:
+        return self._get_result().is_correct
+
+    @property
+    def reason(self) -> str:
+        return self._get_result().reason
+
+    def _get_result(self) -> QAVerificationResult:
+        if self.result is None:
+            raise RuntimeError(
+                f"Verification '{self.check_name}' has not been resolved, await BatchVerificationQueue.collect() first"
+            )
+        return self.result
+
+
+class BatchVerificationQueue:
+    """
+    Buffers verification prompts and runs them as one Azure OpenAI batch job.
+
+    Usage:
+        pending = queue.enqueue(system_prompt, "chunk_connection")
+        await queue.submit()
+        await queue.collect()
+        pending.is_correct
+    """
+
+    POLL_INTERVAL_SECONDS = 30
+
+    def __init__(self, llm_client: AsyncAzureOpenAI, model: str = "gpt-4.1"):
+        """
+        Args:
+            llm_client: The OpenAI client used to upload the requests and download the results.
+            model: Name of a global batch deployment.
+        """
+        self.llm_client = llm_client
+        self.model = model
+        self._pending: dict[str, PendingVerification] = {}
+        self._requests: list[dict] = []
+        self._batch_id: str | None = None
+
+    def enqueue(self, system_prompt: str, check_name: str) -> PendingVerification:
+        """
+        Add a verification prompt to the next batch job.
+
+        Args:
+            system_prompt: The verification prompt including the question and context.
+            check_name: Name of the verification check, used in error messages.
+
+        Returns:
+            PendingVerification: The result, resolved by collect().
+        """
+        custom_id = f"{check_name}-{uuid.uuid4().hex}"
+        pending = PendingVerification(custom_id, check_name)
+
+        self._pending[custom_id] = pending
+        self._requests.append({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                ],
+                "response_format": get_response_format(QAVerificationResult),
+                "max_completion_tokens": 800,
+                "temperature": 0.0,
+                "frequency_penalty": 0.0,
+                "presence_penalty": 0.0
+            }
+        })
+
+        return pending
+
+    async def submit(self):
+        """Upload the buffered prompts and start the batch job."""
+        requests, self._requests = self._requests, []
+
+        if not requests:
+            return
+
+        jsonl = "\n".join(json.dumps(request, ensure_ascii=False) for request in requests)
+        input_file = await self.llm_client.files.create(
+            file=("verification_batch.jsonl", io.BytesIO(jsonl.encode("utf-8"))),
+            purpose="batch"
+        )
+        batch = await self.llm_client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW
+        )
+        self._batch_id = batch.id
+        log.info("✓ Submitted batch %s with %d verification requests", batch.id, len(requests))
+
+    async def collect(self):
+        """
+        Wait for the batch job to finish and resolve the pending verifications.
+        Verifications without a successful response are resolved as failed.
+        """
+        if self._batch_id is not None:
+            batch = await self._wait_for_batch(self._batch_id)
+            self._batch_id = None
+
+            if batch.output_file_id:
+                output = await self.llm_client.files.content(batch.output_file_id)
+                self._resolve_output(output.text)
+            # Requests the batch job rejected are written to a separate error file
+            if batch.error_file_id:
+                errors = await self.llm_client.files.content(batch.error_file_id)
+                self._resolve_output(errors.text)
+            if batch.status != "completed":
+                log.warning("⚠️  Batch %s ended with status '%s'", batch.id, batch.status)
+
+        pending, self._pending = self._pending, {}
+
+        for verification in pending.values():
+            if verification.result is None:
+                verification.result = QAVerificationResult(
+                    is_correct=False,
+                    reason="No result returned by the batch job"
+                )
+
+    async def _wait_for_batch(self, batch_id: str):
+        batch = await self.llm_client.batches.retrieve(batch_id)
+        while batch.status not in TERMINAL_STATUSES:
+            await asyncio.sleep(self.POLL_INTERVAL_SECONDS)
+            batch = await self.llm_client.batches.retrieve(batch_id)
+        return batch
+
+    def _resolve_output(self, output: str):
+        for line in output.splitlines():
+            if not line:
+                continue
+
+            record = json.loads(line)
+            verification = self._pending.get(record["custom_id"])
+            if verification is None:
+                continue
+
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                error = record.get("error") or (response.get("body") or {}).get("error")
+                log.error("Batch request %s failed: %s", record["custom_id"], error)
+                verification.result = QAVerificationResult(
+                    is_correct=False,
+                    reason=f"Batch request failed: {error}"
+                )
+                continue
+
+            # A refusal or a reply cut off by the token limit has no valid content, it only fails this verification
+            try:
+                content = response["body"]["choices"][0]["message"]["content"]
+                verification.result = QAVerificationResult.model_validate_json(content)
+            except (KeyError, IndexError, TypeError, ValidationError) as e:
+                log.error("Batch request %s returned an invalid result: %s", record["custom_id"], e)
+                verification.result = QAVerificationResult(
+                    is_correct=False,
+                    reason="Invalid result returned by the batch job"
+                )